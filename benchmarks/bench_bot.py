@@ -0,0 +1,157 @@
+"""Offline load test for the bot's hot paths: python -m benchmarks.bench_bot --users 200 --rounds 5"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from benchmarks.fakes import DiscordCalls, FakeDatabase, FakeInteraction, FakeUser
+
+def load_bot(database, discord_calls, question_count):
+    with contextlib.redirect_stdout(io.StringIO()):
+        import main
+    
+    # Point every motor collection on the MongoDB wrapper at the fake database
+    for name, value in list(vars(main.db).items()):
+        if type(value).__name__ == 'AsyncIOMotorCollection':
+            setattr(main.db, name, database[value.name])
+    main.db.user_cache.clear()
+    main.answer_journal.path = os.path.join(tempfile.mkdtemp(), 'answers.jsonl')
+    main.answer_journal.load()
+    
+    async def fetch_user(user_id):
+        await discord_calls.call()
+        return FakeUser(user_id)
+    main.bot.fetch_user = fetch_user
+    
+    # A synthetic topic without images so results don't depend on the bank on disk
+    main.qm.questions['math']['bench'] = [
+        {'question': f"Benchmark question {i}", 'options': ['A', 'B', 'C', 'D', 'E'], 'correct_answer': i % 5}
+        for i in range(question_count)
+    ]
+    main.qm._build_pools()
+    config.PREMIUM_SETTINGS['free_question_limit'] = float('inf')
+    main.admission.max_concurrent = float('inf')
+    main.admission.burst = float('inf')
+    return main
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+async def run_phase(name, database, discord_calls, jobs):
+    samples = []
+    
+    async def timed(job):
+        start = time.perf_counter()
+        await job()
+        samples.append(time.perf_counter() - start)
+    
+    operations_before = database.total_operations()
+    calls_before = discord_calls.count
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(job) for job in jobs))
+    elapsed = time.perf_counter() - start
+    
+    samples.sort()
+    return name, {
+        'count': len(samples),
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+        'max_ms': round(samples[-1] * 1000, 3) if samples else 0.0,
+        'throughput_per_s': round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        'mongo_ops_per_call': round((database.total_operations() - operations_before) / max(len(samples), 1), 3),
+        'discord_calls_per_call': round((discord_calls.count - calls_before) / max(len(samples), 1), 3)
+    }
+
+def merge(phases):
+    # Combine per-round phases of the same name into one report entry
+    merged = {}
+    for name, result in phases:
+        merged.setdefault(name, []).append(result)
+    
+    report = {}
+    for name, results in merged.items():
+        count = sum(result['count'] for result in results)
+        report[name] = {
+            'count': count,
+            'p50_ms': max(result['p50_ms'] for result in results),
+            'p95_ms': max(result['p95_ms'] for result in results),
+            'p99_ms': max(result['p99_ms'] for result in results),
+            'max_ms': max(result['max_ms'] for result in results),
+            'throughput_per_s': round(sum(result['throughput_per_s'] for result in results) / len(results), 1),
+            'mongo_ops_per_call': round(sum(result['mongo_ops_per_call'] * result['count'] for result in results) / max(count, 1), 3),
+            'discord_calls_per_call': round(sum(result['discord_calls_per_call'] * result['count'] for result in results) / max(count, 1), 3)
+        }
+    return report
+
+async def run(args):
+    database = FakeDatabase(latency=args.mongo_latency / 1000)
+    discord_calls = DiscordCalls(latency=args.discord_latency / 1000)
+    main = load_bot(database, discord_calls, args.questions)
+    users = range(1, args.users + 1)
+    phases = []
+    
+    def access_job(user_id):
+        return lambda: main.access_control.check_access(FakeInteraction(user_id, discord_calls))
+    
+    def send_job(user_id):
+        return lambda: main.send_question(FakeInteraction(user_id, discord_calls), 'math', 'bench')
+    
+    def answer_job(user_id):
+        async def job():
+            entry = main.active_questions.get(user_id)
+            if entry is not None:
+                await entry['view'].children[0].callback(FakeInteraction(user_id, discord_calls))
+        return job
+    
+    def leaderboard_job(user_id):
+        return lambda: main.leaderboard.callback(FakeInteraction(user_id, discord_calls))
+    
+    for _ in range(args.rounds):
+        phases.append(await run_phase('check_access', database, discord_calls, [access_job(user_id) for user_id in users]))
+        phases.append(await run_phase('send_question', database, discord_calls, [send_job(user_id) for user_id in users]))
+        phases.append(await run_phase('answer', database, discord_calls, [answer_job(user_id) for user_id in users]))
+        phases.append(await run_phase('journal_flush', database, discord_calls, [main.answer_journal.flush]))
+        phases.append(await run_phase('leaderboard', database, discord_calls, [leaderboard_job(user_id) for user_id in users]))
+    
+    return {
+        'config': {
+            'users': args.users,
+            'rounds': args.rounds,
+            'questions': args.questions,
+            'mongo_latency_ms': args.mongo_latency,
+            'discord_latency_ms': args.discord_latency
+        },
+        'scenarios': merge(phases),
+        'mongo_operations': dict(database.operations)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the bot's hot paths offline")
+    parser.add_argument('--users', type=int, default=100, help="concurrent simulated users")
+    parser.add_argument('--rounds', type=int, default=3, help="question/answer rounds per user")
+    parser.add_argument('--questions', type=int, default=500, help="questions in the synthetic topic")
+    parser.add_argument('--mongo-latency', type=float, default=1.0, help="per-operation Mongo latency in ms")
+    parser.add_argument('--discord-latency', type=float, default=50.0, help="per-call Discord API latency in ms")
+    parser.add_argument('--output', help="also write the JSON report to this file")
+    args = parser.parse_args()
+    
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,402 @@
+import asyncio
+import copy
+import itertools
+import random
+from collections import Counter
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+# In-memory stand-ins for the motor collections and discord.Interaction, with latency
+
+MISSING = object()
+
+def _get_path(document, path):
+    value = document
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+def _set_path(document, path, value):
+    parts = path.split('.')
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+def _matches_condition(value, condition):
+    if not isinstance(condition, dict) or not any(key.startswith('$') for key in condition):
+        return value == condition
+    
+    for operator, operand in condition.items():
+        if operator == '$in':
+            if value not in operand:
+                return False
+        elif operator == '$ne':
+            if value == operand or (isinstance(value, list) and operand in value):
+                return False
+        elif operator in ('$lt', '$lte', '$gt', '$gte'):
+            if value is MISSING or value is None:
+                return False
+            if operator == '$lt' and not value < operand:
+                return False
+            if operator == '$lte' and not value <= operand:
+                return False
+            if operator == '$gt' and not value > operand:
+                return False
+            if operator == '$gte' and not value >= operand:
+                return False
+        else:
+            raise NotImplementedError(f"Fake collection does not support {operator}")
+    return True
+
+def evaluate(document, expression):
+    """Evaluate the small subset of aggregation expressions the bot uses"""
+    if isinstance(expression, str) and expression.startswith('$'):
+        value = _get_path(document, expression[1:])
+        return None if value is MISSING else value
+    if not isinstance(expression, dict):
+        return expression
+    if isinstance(expression, dict) and len(expression) == 1:
+        operator, operands = next(iter(expression.items()))
+        if operator.startswith('$'):
+            values = [evaluate(document, operand) for operand in operands] if isinstance(operands, list) else None
+            if operator == '$ifNull':
+                return values[0] if values[0] is not None else values[1]
+            if operator == '$cond':
+                return values[1] if values[0] else values[2]
+            if operator == '$add':
+                return sum(values)
+            if operator == '$subtract':
+                return values[0] - values[1]
+            if operator == '$max':
+                return max(values)
+            if operator == '$min':
+                return min(values)
+            comparisons = {
+                '$gt': lambda a, b: a > b, '$gte': lambda a, b: a >= b,
+                '$lt': lambda a, b: a < b, '$lte': lambda a, b: a <= b,
+                '$eq': lambda a, b: a == b, '$ne': lambda a, b: a != b
+            }
+            if operator in comparisons:
+                return comparisons[operator](values[0], values[1])
+            raise NotImplementedError(f"Fake collection does not support {operator}")
+    return {key: evaluate(document, value) for key, value in expression.items()}
+
+def matches(document, query):
+    for path, condition in (query or {}).items():
+        if path == '$expr':
+            if not evaluate(document, condition):
+                return False
+            continue
+        if path.startswith('$'):
+            raise NotImplementedError(f"Fake collection does not support {path}")
+        if not _matches_condition(_get_path(document, path), condition):
+            return False
+    return True
+
+def apply_update(document, update, inserting=False):
+    if isinstance(update, list):
+        # Update pipeline; only $set stages are supported
+        for stage in update:
+            for path, expression in stage['$set'].items():
+                _set_path(document, path, evaluate(document, expression))
+        return
+    
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            if operator == '$set':
+                _set_path(document, path, copy.deepcopy(value))
+            elif operator == '$setOnInsert':
+                if inserting:
+                    _set_path(document, path, copy.deepcopy(value))
+            elif operator == '$inc':
+                current = _get_path(document, path)
+                _set_path(document, path, (0 if current is MISSING else current) + value)
+            elif operator == '$pull':
+                current = _get_path(document, path)
+                if current is not MISSING:
+                    _set_path(document, path, [item for item in current if not _matches_condition(item, value)])
+            elif operator == '$push':
+                current = _get_path(document, path)
+                items = list(current) if current is not MISSING else []
+                if isinstance(value, dict) and '$each' in value:
+                    items.extend(copy.deepcopy(value['$each']))
+                    if '$slice' in value:
+                        items = items[value['$slice']:] if value['$slice'] < 0 else items[:value['$slice']]
+                else:
+                    items.append(copy.deepcopy(value))
+                _set_path(document, path, items)
+            else:
+                raise NotImplementedError(f"Fake collection does not support {operator}")
+
+def _project(document, projection):
+    if not projection:
+        return copy.deepcopy(document)
+    result = {'_id': document['_id']}
+    for path, include in projection.items():
+        value = _get_path(document, path)
+        if include and value is not MISSING:
+            _set_path(result, path, copy.deepcopy(value))
+    if projection.get('_id', 1) == 0:
+        result.pop('_id', None)
+    return result
+
+class FakeCursor:
+    def __init__(self, collection, query, projection):
+        self.collection = collection
+        self.query = query
+        self.projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+    
+    def sort(self, key, direction=1):
+        self._sort = key if isinstance(key, list) else [(key, direction)]
+        return self
+    
+    def skip(self, count):
+        self._skip = count
+        return self
+    
+    def limit(self, count):
+        self._limit = count
+        return self
+    
+    def batch_size(self, size):
+        return self
+    
+    async def _documents(self):
+        await self.collection._round_trip('find')
+        documents = [document for document in self.collection.documents.values() if matches(document, self.query)]
+        # Stable sorts from the last key to the first give a multi-key order
+        for key, direction in reversed(self._sort or []):
+            documents.sort(key=lambda document: document.get(key, 0), reverse=direction < 0)
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [_project(document, self.projection) for document in documents]
+    
+    async def to_list(self, length=None):
+        return await self._documents()
+    
+    def __aiter__(self):
+        return self._iterate()
+    
+    async def _iterate(self):
+        for document in await self._documents():
+            yield document
+
+class FakeCollection:
+    def __init__(self, name, database):
+        self.name = name
+        self.database = database
+        self.documents = {}
+    
+    async def _round_trip(self, operation):
+        self.database.operations[f"{self.name}.{operation}"] += 1
+        latency = self.database.latency
+        if latency:
+            await asyncio.sleep(random.uniform(latency * (1 - self.database.jitter), latency * (1 + self.database.jitter)))
+    
+    def _upsert_document(self, query, update):
+        document = {key: value for key, value in query.items() if not key.startswith('$') and not isinstance(value, dict)}
+        if '_id' not in document:
+            document['_id'] = next(self.database.ids)
+        apply_update(document, update, inserting=True)
+        if document['_id'] in self.documents:
+            raise DuplicateKeyError(f"duplicate key: {document['_id']}")
+        self.documents[document['_id']] = document
+        return document
+    
+    def _find(self, query):
+        if set(query) == {'_id'} and not isinstance(query['_id'], dict):
+            document = self.documents.get(query['_id'])
+            return document if document is not None and matches(document, query) else None
+        for document in self.documents.values():
+            if matches(document, query):
+                return document
+        return None
+    
+    def with_options(self, **kwargs):
+        return self
+    
+    async def create_index(self, keys, **kwargs):
+        await self._round_trip('create_index')
+    
+    async def find_one(self, query=None, projection=None):
+        await self._round_trip('find_one')
+        document = self._find(query or {})
+        return _project(document, projection) if document else None
+    
+    def find(self, query=None, projection=None):
+        return FakeCursor(self, query or {}, projection)
+    
+    async def count_documents(self, query):
+        await self._round_trip('count_documents')
+        return sum(1 for document in self.documents.values() if matches(document, query))
+    
+    async def estimated_document_count(self):
+        await self._round_trip('estimated_document_count')
+        return len(self.documents)
+    
+    async def insert_one(self, document):
+        await self._round_trip('insert_one')
+        if document['_id'] in self.documents:
+            raise DuplicateKeyError(f"duplicate key: {document['_id']}")
+        self.documents[document['_id']] = copy.deepcopy(document)
+    
+    async def insert_many(self, documents, ordered=True):
+        await self._round_trip('insert_many')
+        errors = []
+        for index, document in enumerate(documents):
+            if document['_id'] in self.documents:
+                errors.append({'index': index, 'code': 11000, 'errmsg': f"duplicate key: {document['_id']}"})
+                if ordered:
+                    break
+                continue
+            self.documents[document['_id']] = copy.deepcopy(document)
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': []})
+    
+    def _update(self, query, update, upsert):
+        document = self._find(query)
+        if document is not None:
+            apply_update(document, update)
+            return document
+        if upsert:
+            return self._upsert_document(query, update)
+        return None
+    
+    async def update_one(self, query, update, upsert=False):
+        await self._round_trip('update_one')
+        self._update(query, update, upsert)
+    
+    async def update_many(self, query, update):
+        await self._round_trip('update_many')
+        for document in [document for document in self.documents.values() if matches(document, query)]:
+            apply_update(document, update)
+    
+    async def find_one_and_update(self, query, update, projection=None, upsert=False, return_document=False):
+        await self._round_trip('find_one_and_update')
+        before = self._find(query)
+        before = copy.deepcopy(before) if before is not None else None
+        after = self._update(query, update, upsert)
+        document = after if return_document else before
+        return _project(document, projection) if document is not None else None
+    
+    async def bulk_write(self, requests, ordered=True):
+        await self._round_trip('bulk_write')
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                self._update(request._filter, request._doc, request._upsert)
+            except DuplicateKeyError as e:
+                errors.append({'index': index, 'code': 11000, 'errmsg': str(e)})
+                if ordered:
+                    break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': []})
+    
+    async def delete_one(self, query):
+        await self._round_trip('delete_one')
+        document = self._find(query)
+        if document is not None:
+            del self.documents[document['_id']]
+    
+    async def delete_many(self, query):
+        await self._round_trip('delete_many')
+        for document in [document for document in self.documents.values() if matches(document, query)]:
+            del self.documents[document['_id']]
+
+class FakeDatabase:
+    def __init__(self, latency=0.0, jitter=0.2):
+        self.latency = latency
+        self.jitter = jitter
+        self.operations = Counter()
+        self.ids = itertools.count(1)
+        self.collections = {}
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+    
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name, self)
+        return self.collections[name]
+    
+    def total_operations(self):
+        return sum(self.operations.values())
+
+class DiscordCalls:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.count = 0
+    
+    async def call(self):
+        self.count += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.name = f"user{user_id}"
+        self.display_name = self.name
+
+class FakeMessage:
+    def __init__(self, calls):
+        self.calls = calls
+        self.id = random.getrandbits(48)
+        self.embeds = []
+    
+    async def edit(self, **kwargs):
+        await self.calls.call()
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+    
+    def is_done(self):
+        return self._done
+    
+    async def _respond(self, kwargs):
+        if self._done:
+            raise RuntimeError("Interaction already responded to")
+        self._done = True
+        self.interaction.sent.append(kwargs)
+        await self.interaction.calls.call()
+    
+    async def send_message(self, content=None, **kwargs):
+        await self._respond(dict(kwargs, content=content))
+    
+    async def edit_message(self, **kwargs):
+        await self._respond(kwargs)
+    
+    async def defer(self, **kwargs):
+        await self._respond(kwargs)
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+    
+    async def send(self, content=None, **kwargs):
+        self.interaction.sent.append(dict(kwargs, content=content))
+        await self.interaction.calls.call()
+
+class FakeInteraction:
+    def __init__(self, user_id, calls, channel_id=1):
+        self.user = FakeUser(user_id)
+        self.channel_id = channel_id
+        self.calls = calls
+        self.sent = []
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.message = FakeMessage(calls)
+    
+    async def edit_original_response(self, **kwargs):
+        self.sent.append(kwargs)
+        await self.calls.call()
@@ -39,6 +39,34 @@ ANALYTICAL_TOPICS = [
     "cr", "ds", "puzzle"
 ]
 
+# Topics by subject, in the order they are loaded and displayed
+SUBJECT_TOPICS = {
+    "math": MATH_TOPICS,
+    "english": ENGLISH_TOPICS,
+    "analytical": ANALYTICAL_TOPICS
+}
+
+# Mock test: questions per subject and the time limit for the whole test (in seconds)
+MOCK_TEST_CONFIG = {
+    "math_count": 10,
+    "english_count": 10,
+    "analytical_count": 5,
+    "time_limit": 30 * 60
+}
+
+# Practice sessions: the most questions one practice command can start
+PRACTICE_SESSION = {
+    "max_count": 20
+}
+
+# Admission control: per-user token buckets ("burst", refilled at "rate" per
+# second) and a cap on concurrent commands
+ADMISSION = {
+    "rate": 0.5,
+    "burst": 5,
+    "max_concurrent": 50
+}
+
 # Premium access settings
 PREMIUM_SETTINGS = {
     "premium_channel_id": 1411595567934738432,
@@ -46,3 +74,83 @@ PREMIUM_SETTINGS = {
     "admin_ids": [1344538585516478494]
 }
 
+# In-process cache in front of MongoDB.get_user
+USER_CACHE = {
+    "max_size": 2048,
+    "ttl": 120
+}
+
+# Question images are uploaded once to this channel and then referenced by URL
+IMAGE_CACHE = {
+    "channel_id": int(os.getenv('IMAGE_CACHE_CHANNEL_ID', 0)) or None,
+    "refresh_margin": 3600
+}
+
+# Question image optimisation (needs Pillow). Images are downscaled to
+# max_dimension and re-encoded as WebP or a 256-colour PNG; workers defaults
+# to the CPU count.
+IMAGE_OPTIMIZATION = {
+    "enabled": os.getenv('OPTIMIZE_IMAGES', '1') == '1',
+    "format": os.getenv('IMAGE_FORMAT', 'webp'),
+    "max_dimension": 1600,
+    "quality": 80,
+    "workers": None
+}
+
+# Sharding: set SHARD_COUNT to run with AutoShardedBot. SHARD_IDS limits this
+# process to some of the shards (set by `python main.py --cluster N`), and
+# SESSION_STORE=mongo shares active-question state between processes.
+SHARDING = {
+    "shard_count": int(os.getenv('SHARD_COUNT', 0)) or None,
+    "shard_ids": [int(shard_id) for shard_id in os.getenv('SHARD_IDS', '').split(',') if shard_id],
+    "session_store": os.getenv('SESSION_STORE', 'memory'),
+    "leaderboard_refresh": 30
+}
+
+# Reloading question topics without a restart. With "watch" on, topic folders
+# are polled for changes every "interval" seconds.
+TOPIC_RELOAD = {
+    "watch": os.getenv('WATCH_QUESTIONS', '0') == '1',
+    "interval": 10
+}
+
+# Question loading. In lazy mode each topic loads on first use, so startup
+# doesn't depend on the size of the bank; with warm_up on, the remaining
+# topics then load in the background, most requested first. Request counts
+# are saved every popularity_interval seconds to order the next warm-up.
+QUESTION_LOADING = {
+    "lazy": os.getenv('LAZY_QUESTIONS', '1') == '1',
+    "warm_up": os.getenv('WARM_UP_QUESTIONS', '1') == '1',
+    "warm_up_workers": 4,
+    "popularity_interval": 300
+}
+
+# Prometheus-format metrics exporter; disabled unless METRICS_PORT is set
+METRICS = {
+    "host": "127.0.0.1",
+    "port": int(os.getenv('METRICS_PORT', 0)) or None
+}
+
+# Local journal of answers not yet written to Mongo; one file per cluster worker
+ANSWER_JOURNAL = {
+    "path": os.getenv('ANSWER_JOURNAL', 'data/answers.jsonl'),
+    "batch_size": 500,
+    "interval": 1.0,
+    "fsync": os.getenv('ANSWER_JOURNAL_FSYNC', '1') == '1',
+    "event_retention": 86400
+}
+
+# User stats export (/export_stats and `python -m utils.stats_export`). Exports
+# larger than the channel's upload limit are left in "directory" on disk.
+STATS_EXPORT = {
+    "directory": "exports",
+    "batch_size": 1000
+}
+
+# Slash command sync. Commands are only synced when their schema changes;
+# DEV_GUILD_ID syncs to a single guild instead (instant, for development) and
+# FORCE_SYNC=1 syncs regardless.
+COMMAND_SYNC = {
+    "dev_guild_id": int(os.getenv('DEV_GUILD_ID', 0)) or None,
+    "force": os.getenv('FORCE_SYNC', '0') == '1'
+}
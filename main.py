@@ -1,6 +1,7 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
+import argparse
 import asyncio
 import os
 import random
@@ -9,32 +10,211 @@ import config
 from utils.database import MongoDB
 from utils.question_manager import QuestionManager
 from utils.access_control import AccessControl
+from utils.leaderboard import Leaderboard, LeaderboardCache
+from utils.image_cache import ImageCache
+from utils.image_optimizer import served_image
+from utils.question_sampler import QuestionSampler
+from utils.active_questions import ExpiringRegistry
+from utils.question_session import QuestionSession
+from utils.session_store import create_session_store
+from utils.topic_reloader import TopicReloader
+from utils.cluster import run_cluster
+from utils.metrics import metrics
+from utils.command_sync import sync_commands
+from utils.views import TrackedView
+from utils.admission import AdmissionControl
+from utils.answer_journal import AnswerJournal
+from utils.stats_export import default_path, export_user_stats
 
 # Setup bot
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(command_prefix=config.BOT_PREFIX, intents=intents)
+if config.SHARDING['shard_count']:
+    bot = commands.AutoShardedBot(
+        command_prefix=config.BOT_PREFIX,
+        intents=intents,
+        shard_count=config.SHARDING['shard_count'],
+        shard_ids=config.SHARDING['shard_ids'] or None,
+        http_trace=metrics.http_trace()
+    )
+else:
+    bot = commands.Bot(command_prefix=config.BOT_PREFIX, intents=intents, http_trace=metrics.http_trace())
 
 # Initialize components
+admission = AdmissionControl(
+    rate=config.ADMISSION['rate'],
+    burst=config.ADMISSION['burst'],
+    max_concurrent=config.ADMISSION['max_concurrent']
+)
 db = MongoDB()
-qm = QuestionManager()
+# Question stats are printed once the bot is ready, not before it connects
+qm = QuestionManager(verbose=False, lazy=config.QUESTION_LOADING['lazy'])
 access_control = AccessControl(db)
+sampler = QuestionSampler(db, qm)
+leaderboard_cache = LeaderboardCache(db)
+leaderboard_service = Leaderboard(db, leaderboard_cache)
+topic_reloader = TopicReloader(
+    qm, db,
+    interval=config.TOPIC_RELOAD['interval'],
+    clustered=config.SHARDING['session_store'] == 'mongo'
+)
+session_store = create_session_store(config.SHARDING['session_store'], db)
+image_cache = ImageCache(bot, db, config.IMAGE_CACHE['channel_id'], config.IMAGE_CACHE['refresh_margin'])
+
+def answer_journal_path():
+    path = config.ANSWER_JOURNAL['path']
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.abspath(__file__)), path)
+    if config.SHARDING['shard_ids']:
+        root, extension = os.path.splitext(path)
+        path = f"{root}-{'-'.join(map(str, config.SHARDING['shard_ids']))}{extension}"
+    return path
+
+def update_leaderboard_scores(scores):
+    # Scores as of each journal flush, so the top stays right for answers
+    # from users whose profile wasn't cached
+    for user_id, score in scores.items():
+        leaderboard_cache.update(user_id, score)
+        leaderboard_service.forget(user_id)
+
+answer_journal = AnswerJournal(
+    db, answer_journal_path(),
+    batch_size=config.ANSWER_JOURNAL['batch_size'],
+    interval=config.ANSWER_JOURNAL['interval'],
+    fsync=config.ANSWER_JOURNAL['fsync'],
+    on_applied=update_leaderboard_scores
+)
+
+async def expire_questions(expired):
+    """Record ignored questions as unanswered and disable their buttons"""
+    await asyncio.gather(
+        db.record_timeouts([(user_id, entry['subject'], entry['reserved']) for user_id, entry in expired]),
+        session_store.release_many([user_id for user_id, _ in expired])
+    )
+    
+    edits = []
+    for _, entry in expired:
+        view = entry['view']
+        for item in view.children:
+            item.disabled = True
+        view.stop()
+        edits.append(entry['interaction'].edit_original_response(content="⏰ Time's up!", view=view))
+    await asyncio.gather(*edits, return_exceptions=True)
+
+# Store active questions; entries expire after the subject's time limit
+active_questions = ExpiringRegistry(on_expire=expire_questions)
+
+async def expire_sessions(expired):
+    """Grade and save sessions whose deadline passed"""
+    await asyncio.gather(*(finish_session(session) for _, session in expired), return_exceptions=True)
 
-# Store active questions
-active_questions = {}
+# Mock tests in progress; entries expire at the end of the test
+mock_sessions = ExpiringRegistry(on_expire=expire_sessions)
+
+# Multi-question practice sessions, saved the same way as mock tests
+practice_sessions = ExpiringRegistry(on_expire=expire_sessions)
+
+metrics.gauge('active_questions', lambda: len(active_questions))
+metrics.gauge('mock_sessions', lambda: len(mock_sessions))
+metrics.gauge('practice_sessions', lambda: len(practice_sessions))
+metrics.gauge('admission_in_flight', lambda: len(admission.in_flight))
+metrics.gauge('admission_rejected', lambda: admission.rejected)
+metrics.gauge('admission_collapsed', lambda: admission.collapsed)
+metrics.gauge('expired_questions_total', lambda: active_questions.expired_count)
+metrics.gauge('user_cache_size', lambda: len(db.user_cache))
+metrics.gauge('user_cache_hit_rate', lambda: db.user_cache.stats()['hit_rate'])
+metrics.gauge('image_cache_hit_rate', lambda: image_cache.stats()['hit_rate'])
+metrics.gauge('image_cache_bytes_saved', lambda: image_cache.bytes_saved)
+metrics.gauge('answer_journal_pending', lambda: len(answer_journal.pending))
+metrics.gauge('answer_journal_failures_total', lambda: answer_journal.failures)
 
 @bot.event
-async def on_ready():
-    print(f'{bot.user} is now online!')
+async def setup_hook():
+    # Runs once per process, unlike on_ready which fires on every reconnect.
+    # Independent startup reads go out together so the gateway connects sooner.
+    answer_journal.load()
+    await asyncio.gather(
+        db.ensure_indexes(),
+        session_store.ensure_indexes(),
+        leaderboard_cache.load(),
+        image_cache.load(),
+        access_control.load()
+    )
+    bot.loop.create_task(access_control.refresh())
+    bot.loop.create_task(answer_journal.run())
+    active_questions.start()
+    mock_sessions.start()
+    practice_sessions.start()
     
+    if config.SHARDING['session_store'] == 'mongo':
+        bot.loop.create_task(leaderboard_cache.refresh(config.SHARDING['leaderboard_refresh']))
+    if config.TOPIC_RELOAD['watch'] or topic_reloader.clustered:
+        bot.loop.create_task(topic_reloader.watch(filesystem=config.TOPIC_RELOAD['watch']))
+    if config.METRICS['port']:
+        await metrics.serve(config.METRICS['host'], config.METRICS['port'])
+    if qm.lazy and config.QUESTION_LOADING['warm_up']:
+        bot.loop.create_task(warm_up_questions())
+    bot.loop.create_task(save_topic_popularity(config.QUESTION_LOADING['popularity_interval']))
+    
+    # In a cluster only the worker holding shard 0 syncs commands
+    if not config.SHARDING['shard_ids'] or 0 in config.SHARDING['shard_ids']:
+        bot.loop.create_task(sync_commands_in_background())
+        bot.loop.create_task(backfill_subject_boards())
+
+async def backfill_subject_boards():
+    # One-off: subject boards started empty, so fill in answers from before them
+    try:
+        if await db.get_meta('subject_boards_backfilled'):
+            return
+        written = await db.backfill_subject_boards(list(config.SUBJECT_TOPICS), config.SCORING)
+        await db.set_meta('subject_boards_backfilled', True)
+        print(f"Backfilled {written} subject leaderboard rows")
+    except Exception as e:
+        print(f"Error backfilling subject leaderboards: {e}")
+
+async def warm_up_questions():
+    try:
+        popularity = await db.get_meta('topic_popularity')
+        await qm.warm_up(popularity, workers=config.QUESTION_LOADING['warm_up_workers'])
+    except Exception as e:
+        print(f"Error warming up questions: {e}")
+
+async def save_topic_popularity(interval):
+    # Topic request counts order the next start's warm-up
+    while True:
+        await asyncio.sleep(interval)
+        counts = qm.take_request_counts()
+        if not counts:
+            continue
+        try:
+            await db.increment_meta('topic_popularity', counts)
+        except Exception as e:
+            qm.request_counts.update(counts)
+            print(f"Error saving topic popularity: {e}")
+
+async def sync_commands_in_background():
     try:
-        synced = await bot.tree.sync()
-        print(f"Loaded {len(synced)} commands")
+        await sync_commands(
+            bot, db,
+            guild_id=config.COMMAND_SYNC['dev_guild_id'],
+            force=config.COMMAND_SYNC['force']
+        )
     except Exception as e:
         print(f"Error: {e}")
 
-class QuestionView(discord.ui.View):
+question_stats_printed = False
+
+@bot.event
+async def on_ready():
+    global question_stats_printed
+    print(f'{bot.user} is now online!')
+    
+    if not question_stats_printed:
+        question_stats_printed = True
+        qm.print_question_stats()
+
+class QuestionView(TrackedView):
     def __init__(self, question_data, subject, user_id):
         super().__init__(timeout=config.TIME_LIMITS.get(subject, 60))
         self.question_data = question_data
@@ -45,6 +225,8 @@ class QuestionView(discord.ui.View):
             self.add_item(QuestionButton(option, i, question_data['correct_answer']))
 
 class QuestionButton(discord.ui.Button):
+    metric_name = "answer"
+    
     def __init__(self, option, index, correct_index):
         super().__init__(label=option, style=discord.ButtonStyle.primary)
         self.index = index
@@ -58,12 +240,16 @@ class QuestionButton(discord.ui.Button):
             await interaction.response.send_message("This is not your question!", ephemeral=True)
             return
         
+        # Claim the question so a double click or a late answer can't be recorded twice
+        entry = active_questions.get(user_id)
+        if entry is None or entry['view'] is not self.view or active_questions.pop(user_id) is None:
+            await interaction.response.send_message("⏰ This question has expired.", ephemeral=True)
+            return
+        
         # Disable all buttons
         for item in self.view.children:
             item.disabled = True
         
-        await interaction.message.edit(view=self.view)
-        
         # Process answer
         is_correct = self.index == self.correct_index
         
@@ -77,121 +263,451 @@ class QuestionButton(discord.ui.Button):
             color = discord.Color.red()
             score_change = config.SCORING['incorrect']
         
-        # Update user data
-        user_data = await db.get_user(user_id)
-        user_data['total_score'] = user_data.get('total_score', 0) + score_change
-        user_data['questions_answered'] = user_data.get('questions_answered', 0) + 1
-        
-        # Update subject stats
-        subject = self.view.subject
-        if subject not in user_data:
-            user_data[subject] = {'correct': 0, 'total': 0}
-        
-        user_data[subject]['total'] = user_data[subject].get('total', 0) + 1
-        if is_correct:
-            user_data[subject]['correct'] = user_data[subject].get('correct', 0) + 1
-        
-        await db.update_user(user_id, user_data)
-        await db.update_leaderboard(user_id, user_data['total_score'])
+        # Journal the answer; the journal writes it to Mongo in the background.
+        # The score shown comes from the cached profile when there is one.
+        new_score = await answer_journal.append(user_id, self.view.subject, is_correct, score_change, release=entry['reserved'])
         
-        # Send result
         embed = discord.Embed(title=result_text, color=color)
         embed.add_field(name="Your Answer", value=self.label, inline=True)
-        embed.add_field(name="Score", value=user_data['total_score'], inline=True)
+        if new_score is not None:
+            embed.add_field(name="Score", value=new_score, inline=True)
+        else:
+            embed.add_field(name="Points", value=f"{score_change:+g}", inline=True)
         
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        # One edit disables the buttons and shows the result under the
+        # question, instead of a message edit followed by a new message
+        await interaction.response.edit_message(embeds=interaction.message.embeds[:1] + [embed], view=self.view)
         
-        # Remove from active questions
-        if user_id in active_questions:
-            del active_questions[user_id]
+        # Bookkeeping that can wait until the answer has been acknowledged
+        await session_store.release(user_id)
+        if new_score is not None:
+            leaderboard_cache.update(user_id, new_score, interaction.user.name)
+        leaderboard_service.forget(user_id)
+
+def build_question_embed(question_data, title, footer):
+    """Build a question embed, plus the file to attach if its image isn't cached"""
+    embed = discord.Embed(
+        title=title,
+        description=f"**Question:**\n{question_data['question']}",
+        color=discord.Color.blue()
+    )
+    embed.set_footer(text=footer)
+    
+    # Handle image: reuse the cached upload if there is one, otherwise attach the file
+    file = None
+    if question_data.get('image_path'):
+        image_url = image_cache.get_url(question_data)
+        if image_url:
+            embed.set_image(url=image_url)
+        else:
+            image_path, _ = served_image(question_data)
+            filename = f"question{os.path.splitext(image_path)[1] or '.png'}"
+            file = discord.File(image_path, filename=filename)
+            embed.set_image(url=f"attachment://{filename}")
+    
+    return embed, file
+
+async def send_response(interaction, content=None, **kwargs):
+    """Reply to an interaction, as a followup if it has been deferred"""
+    if interaction.response.is_done():
+        await interaction.followup.send(content, **kwargs)
+    else:
+        await interaction.response.send_message(content, **kwargs)
+
+async def load_question_topic(interaction, subject, topic):
+    # Loading a topic for the first time can take longer than Discord waits
+    # for a response, so acknowledge the command first
+    if qm.needs_loading(subject, topic):
+        await interaction.response.defer(ephemeral=True)
+        await qm.load_topic(subject, topic)
 
 async def send_question(interaction, subject, topic):
     """Send a question to the user"""
     user_id = interaction.user.id
+    time_limit = config.TIME_LIMITS.get(subject, 60)
     
-    # Check if user already has an active question
-    if user_id in active_questions:
+    # Check if user already has an active question, on any shard
+    if not await session_store.claim(user_id, {'subject': subject, 'topic': topic}, time_limit + 5):
         await interaction.response.send_message("You already have an active question. Please answer it first.", ephemeral=True)
         return
     
-    # Check access
-    has_access, access_type = await access_control.check_access(interaction)
+    sent = False
+    try:
+        sent = await deliver_question(interaction, subject, topic, time_limit)
+    finally:
+        if not sent:
+            await session_store.release(user_id)
+
+async def deliver_question(interaction, subject, topic, time_limit):
+    """Check access and send the question; returns False if nothing was sent"""
+    user_id = interaction.user.id
+    
+    # Check access; free users get a question reserved against their limit
+    has_access, access_type = await access_control.check_access(interaction, hold=time_limit + 5)
     if not has_access:
         await access_control.send_access_denied_message(interaction, access_type)
-        return
+        return False
+    reserved = 1 if access_type == "free_access" else 0
     
     # Get question
-    question_data = qm.get_question(subject, topic)
+    await load_question_topic(interaction, subject, topic)
+    question_data = await sampler.draw(user_id, subject, topic)
     if not question_data:
-        await interaction.response.send_message(f"No questions found for {topic}", ephemeral=True)
-        return
+        if reserved:
+            await db.release_reservations(user_id, reserved)
+        await send_response(interaction, f"No questions found for {topic}", ephemeral=True)
+        return False
     
     # Create embed
-    time_limit = config.TIME_LIMITS.get(subject, 60)
-    embed = discord.Embed(
-        title=f"{subject.capitalize()} - {topic}",
-        description=f"**Question:**\n{question_data['question']}",
-        color=discord.Color.blue()
+    embed, file = build_question_embed(
+        question_data,
+        f"{subject.capitalize()} - {topic}",
+        f"You have {time_limit} seconds"
     )
-    embed.set_footer(text=f"You have {time_limit} seconds")
-    
-    # Handle image
-    file = None
-    if question_data.get('image_path') and os.path.exists(question_data['image_path']):
-        file = discord.File(question_data['image_path'], filename="question.png")
-        embed.set_image(url="attachment://question.png")
     
     view = QuestionView(question_data, subject, user_id)
     
     # Send response
     if file:
-        await interaction.response.send_message(embed=embed, file=file, view=view, ephemeral=True)
+        await send_response(interaction, embed=embed, file=file, view=view, ephemeral=True)
     else:
-        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+        await send_response(interaction, embed=embed, view=view, ephemeral=True)
     
     # Store active question
-    active_questions[user_id] = {
+    active_questions.add(user_id, {
         "question": question_data,
         "subject": subject,
-        "view": view
-    }
+        "view": view,
+        "interaction": interaction,
+        "reserved": reserved
+    }, time_limit)
+    return True
+
+class SessionView(TrackedView):
+    def __init__(self, session, registry):
+        super().__init__(timeout=max(session.remaining_time, 1))
+        self.session = session
+        self.registry = registry
+        self.position = session.index
+        
+        for i, option in enumerate(session.current['question']['options']):
+            self.add_item(SessionButton(option, i))
+        self.add_item(FinishButton())
+    
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.user.id != self.session.user_id:
+            await interaction.response.send_message("This is not your test!", ephemeral=True)
+            return False
+        
+        # Ignore clicks on a question that was already answered or a session that ended
+        if self.registry.get(self.session.user_id) is not self.session or self.session.index != self.position:
+            await interaction.response.send_message("This question is no longer active.", ephemeral=True)
+            return False
+        return True
+    
+    async def end(self, interaction):
+        self.stop()
+        if self.registry.pop(self.session.user_id) is None:
+            # Past the deadline; the registry sweep grades and saves it
+            await interaction.response.send_message("⏰ Time's up!", ephemeral=True)
+            return
+        await finish_session(self.session, interaction)
+
+class SessionButton(discord.ui.Button):
+    metric_name = "session_answer"
+    
+    def __init__(self, option, index):
+        super().__init__(label=option, style=discord.ButtonStyle.primary)
+        self.index = index
+    
+    async def callback(self, interaction: discord.Interaction):
+        session = self.view.session
+        question = session.current['question']
+        is_correct = session.answer(self.index)
+        if session.finished:
+            await self.view.end(interaction)
+            return
+        
+        # Practice shows how the last answer went; mock tests only grade at the end
+        feedback = None
+        if session.kind == "practice":
+            if is_correct:
+                feedback = "✅ Correct!"
+            else:
+                feedback = f"❌ Incorrect! Correct answer: {question['options'][question['correct_answer']]}"
+        
+        self.view.stop()
+        await show_session_question(interaction, session, self.view.registry, feedback)
+
+class FinishButton(discord.ui.Button):
+    metric_name = "session_finish"
+    
+    def __init__(self):
+        super().__init__(label="Finish", style=discord.ButtonStyle.secondary)
+    
+    async def callback(self, interaction: discord.Interaction):
+        await self.view.end(interaction)
+
+async def show_session_question(interaction, session, registry, feedback=None):
+    """Show the session's current question, editing the session message after the first one"""
+    item = session.current
+    minutes, seconds = divmod(session.remaining_time, 60)
+    embed, file = build_question_embed(
+        item['question'],
+        f"{session.title} - Question {session.index + 1}/{len(session.items)}",
+        f"{item['subject'].capitalize()} - {item['topic']} | {minutes}:{seconds:02d} left"
+    )
+    if feedback:
+        embed.description = f"{feedback}\n\n{embed.description}"
+    view = SessionView(session, registry)
+    
+    if session.interaction is None:
+        if file:
+            await send_response(interaction, embed=embed, file=file, view=view, ephemeral=True)
+        else:
+            await send_response(interaction, embed=embed, view=view, ephemeral=True)
+    else:
+        await interaction.response.edit_message(embed=embed, view=view, attachments=[file] if file else [])
+    session.interaction = interaction
+
+async def finish_session(session, interaction=None):
+    """Grade a session and save all of its answers with one write"""
+    results = session.results()
+    summary = session.summary()
+    
+    new_score = None
+    if results:
+        new_score = await db.record_results(
+            session.user_id, results,
+            mock_test=summary if session.kind == "mock_test" else None,
+            release=session.reserved
+        )
+        leaderboard_cache.update(session.user_id, new_score)
+        leaderboard_service.forget(session.user_id)
+    elif session.reserved:
+        await db.release_reservations(session.user_id, session.reserved)
+    if session.kind == "practice":
+        await session_store.release(session.user_id)
+    
+    embed = discord.Embed(title=f"{session.title} finished", color=discord.Color.gold())
+    embed.add_field(name="Answered", value=f"{summary['answered']}/{summary['questions']}", inline=True)
+    embed.add_field(name="Correct", value=summary['correct'], inline=True)
+    embed.add_field(name="Score", value=summary['score'], inline=True)
+    for subject, subject_results in results.items():
+        embed.add_field(
+            name=subject.capitalize(),
+            value=f"{subject_results['correct']}/{subject_results['total']} correct",
+            inline=True
+        )
+    if new_score is not None:
+        embed.add_field(name="Total Score", value=new_score, inline=False)
+    
+    if interaction:
+        await interaction.response.edit_message(embed=embed, view=None, attachments=[])
+    elif session.interaction:
+        await session.interaction.edit_original_response(embed=embed, view=None, attachments=[])
+
+async def start_practice(interaction, subject, topic, count):
+    """Serve one question, or a session of `count` questions answered in one message"""
+    if count == 1:
+        await send_question(interaction, subject, topic)
+        return
+    
+    user_id = interaction.user.id
+    time_limit = config.TIME_LIMITS.get(subject, 60) * count
+    
+    # A session counts as the user's active question, on any shard
+    if not await session_store.claim(user_id, {'subject': subject, 'topic': topic}, time_limit + 5):
+        await interaction.response.send_message("You already have an active question. Please answer it first.", ephemeral=True)
+        return
+    
+    started = False
+    try:
+        started = await start_practice_session(interaction, subject, topic, count, time_limit)
+    finally:
+        if not started:
+            await session_store.release(user_id)
+
+async def start_practice_session(interaction, subject, topic, count, time_limit):
+    """Check access and deal the whole session up front; returns False if it didn't start"""
+    user_id = interaction.user.id
+    
+    # Free users get every question of the session reserved in one call
+    has_access, access_type = await access_control.check_access(interaction, count=count, hold=time_limit + 5)
+    if not has_access:
+        await access_control.send_access_denied_message(interaction, access_type)
+        return False
+    reserved = count if access_type == "free_access" else 0
+    
+    await load_question_topic(interaction, subject, topic)
+    questions = await sampler.draw_many(user_id, subject, topic, count)
+    if not questions:
+        if reserved:
+            await db.release_reservations(user_id, reserved)
+        await send_response(interaction, f"No questions found for {topic}", ephemeral=True)
+        return False
+    
+    # The topic may have fewer questions than asked for
+    if reserved > len(questions):
+        await db.release_reservations(user_id, reserved - len(questions))
+        reserved = len(questions)
+    
+    # Later images upload while the user works on the first question
+    image_cache.prefetch(questions[1:])
+    
+    items = [{'subject': subject, 'topic': topic, 'question': question} for question in questions]
+    session = QuestionSession(user_id, items, time_limit, f"{subject.capitalize()} Practice", kind="practice")
+    session.reserved = reserved
+    practice_sessions.add(user_id, session, time_limit)
+    await show_session_question(interaction, session, practice_sessions)
+    return True
+
+PracticeCount = app_commands.Range[int, 1, config.PRACTICE_SESSION['max_count']]
 
 # Math practice command
 @bot.tree.command(name="math_practice", description="Practice math questions")
 @app_commands.choices(topic=[app_commands.Choice(name=name, value=name) for name in config.MATH_TOPICS])
-async def math_practice(interaction: discord.Interaction, topic: app_commands.Choice[str]):
-    await send_question(interaction, "math", topic.value)
+@app_commands.describe(count="Number of questions to answer in one session")
+@admission.limit("practice")
+@metrics.track("math_practice")
+async def math_practice(interaction: discord.Interaction, topic: app_commands.Choice[str], count: PracticeCount = 1):
+    await start_practice(interaction, "math", topic.value, count)
 
 # English practice command
 @bot.tree.command(name="english_practice", description="Practice English questions")
 @app_commands.choices(topic=[app_commands.Choice(name=name, value=name) for name in config.ENGLISH_TOPICS])
-async def english_practice(interaction: discord.Interaction, topic: app_commands.Choice[str]):
-    await send_question(interaction, "english", topic.value)
+@app_commands.describe(count="Number of questions to answer in one session")
+@admission.limit("practice")
+@metrics.track("english_practice")
+async def english_practice(interaction: discord.Interaction, topic: app_commands.Choice[str], count: PracticeCount = 1):
+    await start_practice(interaction, "english", topic.value, count)
 
 # Analytical practice command
 @bot.tree.command(name="analytical_practice", description="Practice analytical questions")
 @app_commands.choices(topic=[app_commands.Choice(name=name, value=name) for name in config.ANALYTICAL_TOPICS])
-async def analytical_practice(interaction: discord.Interaction, topic: app_commands.Choice[str]):
-    await send_question(interaction, "analytical", topic.value)
+@app_commands.describe(count="Number of questions to answer in one session")
+@admission.limit("practice")
+@metrics.track("analytical_practice")
+async def analytical_practice(interaction: discord.Interaction, topic: app_commands.Choice[str], count: PracticeCount = 1):
+    await start_practice(interaction, "analytical", topic.value, count)
+
+# Mock test command
+@bot.tree.command(name="mock_test", description="Take a timed mock test")
+@admission.limit("mock_test")
+@metrics.track("mock_test")
+async def mock_test(interaction: discord.Interaction):
+    user_id = interaction.user.id
+    
+    if user_id in mock_sessions:
+        await interaction.response.send_message("You already have a mock test in progress.", ephemeral=True)
+        return
+    
+    # Mock tests draw from every topic; usually the warm-up has loaded them all
+    if qm.unloaded_topics():
+        await interaction.response.defer(ephemeral=True)
+        await qm.load_all()
+    items = qm.generate_mock_test()
+    if not items:
+        await send_response(interaction, "No questions available for a mock test", ephemeral=True)
+        return
+    
+    # Check access, reserving every question of the test for free users
+    time_limit = config.MOCK_TEST_CONFIG['time_limit']
+    has_access, access_type = await access_control.check_access(interaction, count=len(items), hold=time_limit + 5)
+    if not has_access:
+        await access_control.send_access_denied_message(interaction, access_type)
+        return
+    
+    session = QuestionSession(user_id, items, time_limit, "Mock Test")
+    if access_type == "free_access":
+        session.reserved = len(items)
+    mock_sessions.add(user_id, session, time_limit)
+    await show_session_question(interaction, session, mock_sessions)
 
 # Leaderboard command
-@bot.tree.command(name="leaderboard", description="Show leaderboard")
-async def leaderboard(interaction: discord.Interaction):
-    leaderboard_data = await db.get_leaderboard(10)
+LEADERBOARD_PERIODS = {'all': "All time", 'day': "Today", 'week': "This week"}
+
+async def build_leaderboard_page(page, subject=None, period='all'):
+    page, page_count, entries = await leaderboard_service.get_page(page, subject, period)
+    names = await leaderboard_cache.resolve_names(bot, [user_id for _, user_id, _ in entries])
     
-    embed = discord.Embed(title="Leaderboard", color=discord.Color.gold())
+    title = "Leaderboard"
+    if subject or period != 'all':
+        title += f" — {' · '.join(filter(None, [subject and subject.title(), LEADERBOARD_PERIODS[period]]))}"
+    embed = discord.Embed(title=title, color=discord.Color.gold())
+    for rank, user_id, score in entries:
+        embed.add_field(name=f"{rank}. {names[user_id]}", value=f"Score: {score}", inline=False)
+    if not entries:
+        embed.description = "No scores yet."
+    embed.set_footer(text=f"Page {page}/{page_count}")
     
-    for i, (user_id, score) in enumerate(leaderboard_data[:10], 1):
-        try:
-            user = await bot.fetch_user(int(user_id))
-            embed.add_field(name=f"{i}. {user.name}", value=f"Score: {score}", inline=False)
-        except:
-            embed.add_field(name=f"{i}. User {user_id}", value=f"Score: {score}", inline=False)
+    view = LeaderboardView(page, page_count, subject, period) if page_count > 1 else None
+    return embed, view
+
+class LeaderboardView(TrackedView):
+    def __init__(self, page, page_count, subject, period):
+        super().__init__(timeout=120)
+        self.subject = subject
+        self.period = period
+        self.add_item(LeaderboardPageButton("◀ Previous", page - 1, disabled=page <= 1))
+        self.add_item(LeaderboardPageButton("Next ▶", page + 1, disabled=page >= page_count))
+
+class LeaderboardPageButton(discord.ui.Button):
+    metric_name = "leaderboard_page"
     
-    await interaction.response.send_message(embed=embed)
+    def __init__(self, label, page, disabled):
+        super().__init__(label=label, style=discord.ButtonStyle.secondary, disabled=disabled)
+        self.page = page
+    
+    async def callback(self, interaction: discord.Interaction):
+        self.view.stop()
+        embed, view = await build_leaderboard_page(self.page, self.view.subject, self.view.period)
+        await interaction.response.edit_message(embed=embed, view=view)
+
+@bot.tree.command(name="leaderboard", description="Show leaderboard")
+@app_commands.describe(page="Page number", subject="Rank by one subject", period="Rank by this period's score")
+@app_commands.choices(
+    subject=[app_commands.Choice(name=name.title(), value=name) for name in config.SUBJECT_TOPICS],
+    period=[app_commands.Choice(name=label, value=value) for value, label in LEADERBOARD_PERIODS.items()]
+)
+@admission.limit("leaderboard")
+@metrics.track("leaderboard")
+async def leaderboard(
+    interaction: discord.Interaction,
+    page: app_commands.Range[int, 1] = 1,
+    subject: app_commands.Choice[str] = None,
+    period: app_commands.Choice[str] = None
+):
+    embed, view = await build_leaderboard_page(
+        page,
+        subject.value if subject else None,
+        period.value if period else 'all'
+    )
+    if view:
+        await interaction.response.send_message(embed=embed, view=view)
+    else:
+        await interaction.response.send_message(embed=embed)
+
+# Rank command
+@bot.tree.command(name="rank", description="Check your leaderboard rank")
+@admission.limit("rank")
+@metrics.track("rank")
+async def rank(interaction: discord.Interaction):
+    result = await leaderboard_service.get_rank(interaction.user.id)
+    if result is None:
+        await interaction.response.send_message("You're not on the leaderboard yet. Answer a question to get ranked!", ephemeral=True)
+        return
+    
+    user_rank, score = result
+    embed = discord.Embed(title=f"{interaction.user.name}'s Rank", color=discord.Color.gold())
+    embed.add_field(name="Rank", value=f"#{user_rank}", inline=True)
+    embed.add_field(name="Score", value=score, inline=True)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
 
 # Profile command
 @bot.tree.command(name="profile", description="Check your stats")
+@admission.limit("profile")
+@metrics.track("profile")
 async def profile(interaction: discord.Interaction):
     user_id = interaction.user.id
     user_data = await db.get_user(user_id)
@@ -202,6 +718,95 @@ async def profile(interaction: discord.Interaction):
     
     await interaction.response.send_message(embed=embed)
 
+# Reload topic command (admin only)
+@bot.tree.command(name="reload_topic", description="Reload a question topic from disk (admin only)")
+@app_commands.choices(subject=[app_commands.Choice(name=name, value=name) for name in config.SUBJECT_TOPICS])
+@metrics.track("reload_topic")
+async def reload_topic(interaction: discord.Interaction, subject: app_commands.Choice[str], topic: str):
+    if not access_control.is_admin(interaction.user.id):
+        await interaction.response.send_message("This command is for admins only.", ephemeral=True)
+        return
+    
+    await interaction.response.defer(ephemeral=True)
+    count = await topic_reloader.reload(subject.value, topic, publish=True)
+    if count is None:
+        topics = ", ".join(config.SUBJECT_TOPICS[subject.value])
+        await interaction.followup.send(f"Unknown topic '{topic}'. Topics: {topics}", ephemeral=True)
+    else:
+        await interaction.followup.send(f"Reloaded {subject.value}/{topic}: {count} questions", ephemeral=True)
+
+# Premium command (admin only)
+@bot.tree.command(name="premium", description="Grant or revoke premium access (admin only)")
+@metrics.track("premium")
+async def premium(interaction: discord.Interaction, member: discord.User, enabled: bool):
+    if not access_control.is_admin(interaction.user.id):
+        await interaction.response.send_message("This command is for admins only.", ephemeral=True)
+        return
+    
+    await access_control.set_premium(member.id, enabled)
+    state = "granted to" if enabled else "revoked from"
+    await interaction.response.send_message(f"Premium access {state} {member.name}.", ephemeral=True)
+
+# Stats command (admin only)
+@bot.tree.command(name="stats", description="Show bot performance stats (admin only)")
+@metrics.track("stats")
+async def stats(interaction: discord.Interaction):
+    if not access_control.is_admin(interaction.user.id):
+        await interaction.response.send_message("This command is for admins only.", ephemeral=True)
+        return
+    
+    embed = discord.Embed(title="Bot Stats", color=discord.Color.blurple())
+    for command, summary in sorted(metrics.command_summary().items()):
+        embed.add_field(
+            name=command,
+            value=(
+                f"{summary['calls']} calls\n"
+                f"p50 ≤ {summary['p50'] * 1000:.0f} ms, p95 ≤ {summary['p95'] * 1000:.0f} ms\n"
+                f"{summary['mongo_per_call']:.1f} db / {summary['discord_per_call']:.1f} api per call"
+            ),
+            inline=True
+        )
+    
+    gauges = "\n".join(f"{name}: {value:.3g}" for name, value in sorted(metrics.gauge_values().items()))
+    embed.add_field(name="Gauges", value=gauges or "none", inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+# Export stats command (admin only)
+@bot.tree.command(name="export_stats", description="Export per-user stats as CSV (admin only)")
+@app_commands.describe(compress="gzip the CSV")
+@metrics.track("export_stats")
+async def export_stats(interaction: discord.Interaction, compress: bool = False):
+    if not access_control.is_admin(interaction.user.id):
+        await interaction.response.send_message("This command is for admins only.", ephemeral=True)
+        return
+    
+    await interaction.response.defer(ephemeral=True)
+    path = default_path(compress)
+    count = await export_user_stats(db, path, compress=compress)
+    
+    size = os.path.getsize(path)
+    upload_limit = interaction.guild.filesize_limit if interaction.guild else 10 * 1024 * 1024
+    if size <= upload_limit:
+        await interaction.followup.send(
+            f"Exported {count} users.",
+            file=discord.File(path, filename=os.path.basename(path)),
+            ephemeral=True
+        )
+        # Uploaded exports live in Discord; only oversized ones stay on disk
+        os.remove(path)
+    else:
+        await interaction.followup.send(
+            f"Exported {count} users ({size // (1024 * 1024)} MB, over the upload limit). Saved to `{path}`",
+            ephemeral=True
+        )
+
 # Run the bot
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cluster", type=int, metavar="WORKERS", help="run as this many worker processes")
+    parser.add_argument("--shards", type=int, help="total shard count in cluster mode (default: one per worker)")
+    args = parser.parse_args()
+    
+    if args.cluster:
+        raise SystemExit(run_cluster(args.cluster, args.shards or args.cluster, qm.base_dir))
     bot.run(config.BOT_TOKEN)
@@ -1,43 +1,72 @@
+import asyncio
 import discord
 from datetime import datetime
 import config
 
 class AccessControl:
-    def __init__(self, database):
+    def __init__(self, database, refresh_interval=300):
         self.db = database
+        self.refresh_interval = refresh_interval
+        self.admin_ids = set(config.PREMIUM_SETTINGS["admin_ids"])
+        self.premium_users = set()
     
-    async def check_access(self, interaction):
+    async def load(self):
+        self.premium_users = await self.db.get_premium_user_ids()
+    
+    async def refresh(self):
+        # Picks up premium changes made by other processes
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"Error refreshing premium users: {e}")
+    
+    def is_admin(self, user_id):
+        return user_id in self.admin_ids
+    
+    async def set_premium(self, user_id, enabled):
+        await self.db.set_premium_access(user_id, enabled)
+        if enabled:
+            self.premium_users.add(str(user_id))
+        else:
+            self.premium_users.discard(str(user_id))
+    
+    async def check_access(self, interaction, count=1, hold=60):
+        """Check whether the user may take `count` questions, reserving free ones for `hold` seconds"""
         user_id = interaction.user.id
         channel_id = interaction.channel_id
         
         # Check if user is admin
-        if user_id in config.PREMIUM_SETTINGS["admin_ids"]:
+        if self.is_admin(user_id):
             return True, "admin"
         
         # Check premium channel access
         if channel_id == config.PREMIUM_SETTINGS["premium_channel_id"]:
-            user_data = await self.db.get_user(user_id)
-            if user_data.get('premium_access'):
+            if str(user_id) in self.premium_users:
                 return True, "premium_channel"
             else:
                 return False, "no_premium_in_channel"
         
-        # Regular channel - check question limit
-        user_data = await self.db.get_user(user_id)
-        questions_answered = user_data.get('questions_answered', 0)
-        if questions_answered < config.PREMIUM_SETTINGS["free_question_limit"]:
+        # Regular channel - check and reserve against the question limit
+        reserved = await self.db.reserve_free_questions(
+            user_id, count, config.PREMIUM_SETTINGS["free_question_limit"], hold
+        )
+        if reserved:
             return True, "free_access"
         else:
             return False, "limit_reached"
     
     async def send_access_denied_message(self, interaction, access_type):
+        # Commands that load questions first have already deferred
+        send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
         if access_type == "no_premium_in_channel":
             embed = discord.Embed(
                 title="🚫 Premium Access Required",
                 description="This channel requires premium access.",
                 color=discord.Color.red()
             )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await send(embed=embed, ephemeral=True)
         
         elif access_type == "limit_reached":
             embed = discord.Embed(
@@ -45,4 +74,4 @@ class AccessControl:
                 description=f"You've used all free questions!",
                 color=discord.Color.orange()
             )
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await send(embed=embed, ephemeral=True)
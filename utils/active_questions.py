@@ -0,0 +1,76 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+class ExpiringRegistry:
+    """Per-user entries in a deadline heap; one task hands each sweep's expired entries to `on_expire`"""
+
+    def __init__(self, on_expire=None, interval=1.0):
+        self.on_expire = on_expire
+        self.interval = interval
+        self.entries = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._task = None
+        self.expired_count = 0
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __contains__(self, user_id):
+        return user_id in self.entries
+    
+    def add(self, user_id, entry, timeout):
+        token = next(self._counter)
+        deadline = time.monotonic() + timeout
+        self.entries[user_id] = (token, deadline, entry)
+        heapq.heappush(self._heap, (deadline, token, user_id))
+    
+    def get(self, user_id):
+        item = self.entries.get(user_id)
+        return item[2] if item else None
+    
+    def pop(self, user_id):
+        """Remove and return the entry, or None if it is missing or past its deadline."""
+        item = self.entries.get(user_id)
+        if item is None or item[1] <= time.monotonic():
+            return None
+        del self.entries[user_id]
+        return item[2]
+    
+    def _collect_expired(self):
+        now = time.monotonic()
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, token, user_id = heapq.heappop(self._heap)
+            item = self.entries.get(user_id)
+            if item is not None and item[0] == token:
+                del self.entries[user_id]
+                expired.append((user_id, item[2]))
+        return expired
+    
+    async def _sweep(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            expired = self._collect_expired()
+            if not expired:
+                continue
+            
+            self.expired_count += len(expired)
+            if self.on_expire:
+                try:
+                    await self.on_expire(expired)
+                except Exception as e:
+                    print(f"ERROR handling {len(expired)} expired entries: {e}")
+    
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweep())
+    
+    def stats(self):
+        return {
+            'active': len(self.entries),
+            'heap_size': len(self._heap),
+            'expired': self.expired_count
+        }
@@ -0,0 +1,90 @@
+import functools
+import time
+
+import discord
+
+from utils.metrics import metrics
+
+REJECTION_MESSAGES = {
+    'duplicate': "⏳ Your previous request is still being processed.",
+    'busy': "🚦 The bot is busy right now. Please try again in a few seconds.",
+    'rate_limited': "🐢 You're sending commands too quickly. Please slow down."
+}
+
+class AdmissionControl:
+    """Turns away duplicate, over-capacity and rate-limited commands with an immediate reply"""
+
+    def __init__(self, rate=0.5, burst=5, max_concurrent=50, max_buckets=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self.max_buckets = max_buckets
+        self.buckets = {}
+        self.in_flight = set()
+        self.rejected = 0
+        self.collapsed = 0
+    
+    def _take_token(self, user_id):
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(user_id, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self.buckets[user_id] = (tokens, now)
+            return False
+        self.buckets[user_id] = (tokens - 1, now)
+        
+        if len(self.buckets) > self.max_buckets:
+            self._prune(now)
+        return True
+    
+    def _prune(self, now):
+        # Buckets that have refilled completely are the same as no bucket
+        for user_id, (tokens, updated) in list(self.buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self.buckets[user_id]
+    
+    def admit(self, user_id, key):
+        """Admit a request, returning None, or the reason it was turned away"""
+        if (user_id, key) in self.in_flight:
+            self.collapsed += 1
+            metrics.inc('admission_collapsed_total', kind=key)
+            return 'duplicate'
+        
+        if len(self.in_flight) >= self.max_concurrent:
+            reason = 'busy'
+        elif not self._take_token(user_id):
+            reason = 'rate_limited'
+        else:
+            self.in_flight.add((user_id, key))
+            return None
+        
+        self.rejected += 1
+        metrics.inc('admission_rejected_total', kind=key, reason=reason)
+        return reason
+    
+    def release(self, user_id, key):
+        self.in_flight.discard((user_id, key))
+    
+    def limit(self, key):
+        """Decorator for command callbacks; requests sharing `key` collapse per user"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(interaction: discord.Interaction, *args, **kwargs):
+                user_id = interaction.user.id
+                reason = self.admit(user_id, key)
+                if reason:
+                    await interaction.response.send_message(REJECTION_MESSAGES[reason], ephemeral=True)
+                    return
+                try:
+                    return await func(interaction, *args, **kwargs)
+                finally:
+                    self.release(user_id, key)
+            return wrapper
+        return decorator
+    
+    def stats(self):
+        return {
+            'in_flight': len(self.in_flight),
+            'rejected': self.rejected,
+            'collapsed': self.collapsed
+        }
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+class AnswerJournal:
+    """Append-only file of answers, written to Mongo in batches and replayed at startup"""
+
+    def __init__(self, database, path, batch_size=500, interval=1.0, fsync=True, on_applied=None):
+        self.db = database
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.fsync = fsync
+        self.on_applied = on_applied
+        self.pending = []
+        self.flushed = 0
+        self.failures = 0
+        self._file = None
+        self._written = 0
+        self._synced = 0
+        self._syncing = None
+        self._wakeup = asyncio.Event()
+    
+    def load(self):
+        """Open the journal, queueing any events a previous run didn't apply"""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        if os.path.exists(self.path):
+            with open(self.path, 'rb+') as f:
+                data = f.read()
+                # A line torn by a crash mid-write was never acknowledged; cut
+                # it off so the next event doesn't land on the end of it
+                end = data.rfind(b'\n') + 1
+                if end < len(data):
+                    f.truncate(end)
+            for line in data[:end].splitlines():
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                self.pending.append(event)
+                self.db.add_pending_event(event)
+        if self.pending:
+            print(f"Answer journal: replaying {len(self.pending)} events")
+        
+        self._file = open(self.path, 'a', encoding='utf-8')
+        return len(self.pending)
+    
+    async def append(self, user_id, subject, is_correct, score_delta, release=0):
+        """Journal an answer; returns the user's new total score, or None if their profile isn't cached"""
+        event = {
+            'id': uuid.uuid4().hex,
+            'user_id': str(user_id),
+            'subject': subject,
+            'correct': is_correct,
+            'score': score_delta,
+            'release': release,
+            'time': time.time()
+        }
+        self._file.write(json.dumps(event, separators=(',', ':')) + '\n')
+        self._file.flush()
+        self._written += 1
+        
+        # Counted before waiting on the disk, so a flush in the meantime
+        # finds it and clears it
+        self.pending.append(event)
+        new_score = self.db.add_pending_event(event)
+        if len(self.pending) >= self.batch_size:
+            self._wakeup.set()
+        if self.fsync:
+            await self._sync(self._written)
+        return new_score
+    
+    async def _sync(self, position):
+        # Answers written while an fsync runs share the next one
+        while self._synced < position:
+            if self._syncing is None:
+                self._syncing = asyncio.ensure_future(self._fsync())
+            await asyncio.shield(self._syncing)
+    
+    async def _fsync(self):
+        position = self._written
+        try:
+            await asyncio.to_thread(os.fsync, self._file.fileno())
+            self._synced = position
+        finally:
+            self._syncing = None
+    
+    async def flush(self):
+        applied = False
+        while self.pending:
+            batch = self.pending[:self.batch_size]
+            scores = await self.db.record_answer_events(batch)
+            # Answers appended during the write are behind the batch, not in it
+            del self.pending[:len(batch)]
+            self.flushed += len(batch)
+            applied = True
+            if self.on_applied:
+                self.on_applied(scores)
+        
+        # Nothing can be appended between the last write and here, so every
+        # event in the file has been applied
+        if applied:
+            self._file.seek(0)
+            self._file.truncate()
+    
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            try:
+                await self.flush()
+            except Exception as e:
+                # Events stay pending and in the file; the next pass retries them
+                self.failures += 1
+                print(f"Error flushing answer journal ({len(self.pending)} pending): {e}")
+    
+    def stats(self):
+        return {
+            'pending': len(self.pending),
+            'flushed': self.flushed,
+            'failures': self.failures
+        }
@@ -0,0 +1,37 @@
+import os
+import signal
+import subprocess
+import sys
+
+from utils import image_optimizer, question_manifest
+
+def shard_groups(shard_count, workers):
+    groups = [[] for _ in range(workers)]
+    for shard_id in range(shard_count):
+        groups[shard_id % workers].append(shard_id)
+    return [group for group in groups if group]
+
+def run_cluster(workers, shard_count, base_dir):
+    """Build the question files once, then run `workers` bot processes that split the shards"""
+    image_optimizer.optimize_bank(base_dir, question_manifest.build_manifest(base_dir))
+    
+    processes = []
+    for shard_ids in shard_groups(shard_count, workers):
+        env = dict(os.environ)
+        env['SHARD_COUNT'] = str(shard_count)
+        env['SHARD_IDS'] = ','.join(str(shard_id) for shard_id in shard_ids)
+        env['SESSION_STORE'] = 'mongo'
+        print(f"Starting worker for shards {env['SHARD_IDS']} of {shard_count}")
+        processes.append(subprocess.Popen([sys.executable, os.path.join(base_dir, 'main.py')], env=env))
+    
+    def stop(signum, frame):
+        for process in processes:
+            process.terminate()
+    
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    
+    exit_code = 0
+    for process in processes:
+        exit_code = process.wait() or exit_code
+    return exit_code
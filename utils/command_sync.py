@@ -0,0 +1,33 @@
+import hashlib
+import json
+
+import discord
+
+def command_tree_hash(tree, guild=None):
+    """Stable hash of the command schema Discord would receive for this tree"""
+    payload = []
+    for command in tree.get_commands(guild=guild):
+        try:
+            payload.append(command.to_dict(tree))
+        except TypeError:
+            # discord.py < 2.4 takes no tree argument
+            payload.append(command.to_dict())
+    payload.sort(key=lambda command: (command.get('type', 1), command['name']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+async def sync_commands(bot, database, guild_id=None, force=False):
+    """Sync the command tree only if its schema hash in Mongo changed (to one guild when given)"""
+    guild = discord.Object(id=guild_id) if guild_id else None
+    if guild:
+        bot.tree.copy_global_to(guild=guild)
+    
+    tree_hash = command_tree_hash(bot.tree, guild)
+    key = f"command_tree:{bot.application_id}:{guild_id or 'global'}"
+    if not force and await database.get_meta(key) == tree_hash:
+        print("Commands unchanged, skipping sync")
+        return None
+    
+    synced = await bot.tree.sync(guild=guild)
+    await database.set_meta(key, tree_hash)
+    print(f"Loaded {len(synced)} commands")
+    return synced
@@ -1,16 +1,87 @@
+import asyncio
+import copy
 import motor.motor_asyncio
-from datetime import datetime
+from pymongo import ReadPreference, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from datetime import datetime, timedelta
 import os
 
+import config
+from utils.cache import TTLCache
+from utils.leaderboard import board_updates
+from utils.metrics import metrics
+
+def answer_results(subject, is_correct, score_delta):
+    return {subject: {'correct': 1 if is_correct else 0, 'total': 1, 'score': score_delta}}
+
+def result_increments(results, release=0):
+    increments = {
+        'total_score': sum(subject_results['score'] for subject_results in results.values()),
+        'questions_answered': sum(subject_results['total'] for subject_results in results.values())
+    }
+    for subject, subject_results in results.items():
+        increments[f'{subject}.correct'] = subject_results['correct']
+        increments[f'{subject}.total'] = subject_results['total']
+    if release:
+        # Answered questions move from the free-tier reservation to questions_answered
+        increments['reserved'] = -release
+    return increments
+
+def add_increments(document, increments):
+    for path, value in increments.items():
+        *parents, field = path.split('.')
+        for parent in parents:
+            document = document.setdefault(parent, {})
+        document[field] = document.get(field, 0) + value
+
+def bucket_request(board, user_id, expires_at, delta, query=None, update=None):
+    return UpdateOne(
+        dict({'_id': f'{board}:{user_id}'}, **(query or {})),
+        dict({'$inc': {'score': delta}, '$setOnInsert': {'board': board, 'user_id': str(user_id), 'expires_at': expires_at}}, **(update or {})),
+        upsert=True
+    )
+
 class MongoDB:
     def __init__(self):
         self.mongo_uri = os.getenv('MONGO_URI', 'mongodb://localhost:27017/discord_bot')
-        self.client = motor.motor_asyncio.AsyncIOMotorClient(self.mongo_uri)
+        self.client = motor.motor_asyncio.AsyncIOMotorClient(
+            self.mongo_uri,
+            event_listeners=[metrics.mongo_listener()]
+        )
         self.db = self.client.get_database()
         self.users = self.db.users
         self.leaderboard = self.db.leaderboard
+        self.leaderboard_buckets = self.db.leaderboard_buckets
+        self.image_urls = self.db.image_urls
+        self.topic_versions = self.db.topic_versions
+        self.meta = self.db.meta
+        self.answer_events = self.db.answer_events
+        self.user_cache = TTLCache(
+            max_size=config.USER_CACHE['max_size'],
+            ttl=config.USER_CACHE['ttl']
+        )
+        # Increments of journaled answers that haven't reached Mongo yet, by
+        # user and event id. Every profile cached from a Mongo read gets them
+        # added, so scores don't drop back while answers wait in the journal.
+        self.pending_results = {}
+    
+    @metrics.timed('mongo')
+    async def ensure_indexes(self):
+        # _id breaks ties so leaderboard pages don't shift between requests
+        await self.leaderboard.create_index([('score', -1), ('_id', 1)])
+        await self.leaderboard_buckets.create_index([('board', 1), ('score', -1), ('user_id', 1)])
+        await self.leaderboard_buckets.create_index('expires_at', expireAfterSeconds=0)
+        await self.answer_events.create_index('expires_at', expireAfterSeconds=0)
     
     async def get_user(self, user_id):
+        cached = self.user_cache.get(str(user_id))
+        if cached is not None:
+            return dict(cached)
+        return await self.load_user(user_id)
+    
+    # Timed separately from get_user so cache hits don't dilute the Mongo latency
+    @metrics.timed('mongo')
+    async def load_user(self, user_id):
         user_data = await self.users.find_one({'_id': str(user_id)})
         if not user_data:
             user_data = {
@@ -19,25 +90,368 @@ class MongoDB:
                 'questions_answered': 0
             }
             await self.users.insert_one(user_data)
-        return user_data
+        return dict(self._cache_user(user_data))
     
+    @metrics.timed('mongo')
     async def update_user(self, user_id, update_data):
         await self.users.update_one(
             {'_id': str(user_id)},
             {'$set': update_data},
             upsert=True
         )
+        self.user_cache.invalidate(str(user_id))
     
+    @metrics.timed('mongo')
     async def update_leaderboard(self, user_id, score):
         await self.leaderboard.update_one(
             {'_id': str(user_id)},
             {'$set': {'score': score}},
             upsert=True
         )
+        self.user_cache.invalidate(str(user_id))
+    
+    @metrics.timed('mongo')
+    async def get_premium_user_ids(self):
+        premium_user_ids = set()
+        async for document in self.users.find({'premium_access': True}, {'_id': 1}):
+            premium_user_ids.add(document['_id'])
+        return premium_user_ids
+    
+    @metrics.timed('mongo')
+    async def set_premium_access(self, user_id, enabled):
+        await self.update_user(user_id, {'premium_access': enabled})
+    
+    @metrics.timed('mongo')
+    async def reserve_free_questions(self, user_id, count, limit, hold):
+        """Atomically check the free limit and hold `count` questions until the latest requested deadline"""
+        if count > limit:
+            return False
+        
+        now = datetime.utcnow()
+        reserved_until = {'$ifNull': ['$reserved_until', datetime(1970, 1, 1)]}
+        live_reserved = {'$cond': [
+            {'$gt': [reserved_until, now]},
+            {'$max': [0, {'$ifNull': ['$reserved', 0]}]},
+            0
+        ]}
+        try:
+            await self.users.find_one_and_update(
+                {'_id': str(user_id), '$expr': {'$lte': [
+                    {'$add': [{'$ifNull': ['$questions_answered', 0]}, live_reserved, count]},
+                    limit
+                ]}},
+                [{'$set': {
+                    'reserved': {'$add': [live_reserved, count]},
+                    'reserved_until': {'$max': [reserved_until, now + timedelta(seconds=hold)]}
+                }}],
+                projection={'_id': 1},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # The user exists but is over the limit, so the upsert collided with them
+            return False
+        return True
+    
+    @metrics.timed('mongo')
+    async def release_reservations(self, user_id, count):
+        await self.users.update_one(
+            {'_id': str(user_id)},
+            [{'$set': {'reserved': {'$max': [0, {'$subtract': [{'$ifNull': ['$reserved', 0]}, count]}]}}}]
+        )
+    
+    @metrics.timed('mongo')
+    async def record_answer(self, user_id, subject, is_correct, score_delta, release=0):
+        return await self.record_results(user_id, answer_results(subject, is_correct, score_delta), release=release)
+    
+    @metrics.timed('mongo')
+    async def record_results(self, user_id, results, mock_test=None, release=0):
+        # Atomic increments instead of read-modify-write, so concurrent clicks
+        # can't overwrite each other. The user and leaderboard updates don't
+        # depend on each other, so they all go out at once. The returned
+        # document refreshes the profile cache.
+        increments = result_increments(results, release)
+        update = {'$inc': increments}
+        if mock_test:
+            # Keep the most recent mock test summaries on the profile
+            mock_test = dict(mock_test, completed_at=datetime.utcnow())
+            update['$push'] = {'mock_tests': {'$each': [mock_test], '$slice': -20}}
+        
+        user_update = self.users.find_one_and_update(
+            {'_id': str(user_id)},
+            update,
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        leaderboard_update = self.leaderboard.update_one(
+            {'_id': str(user_id)},
+            {'$inc': {'score': increments['total_score']}},
+            upsert=True
+        )
+        updates = [user_update, leaderboard_update]
+        
+        # Subject, daily and weekly buckets, so those leaderboards never scan users
+        bucket_requests = [
+            bucket_request(board, user_id, expires_at, delta)
+            for board, expires_at, delta in board_updates(results, datetime.utcnow())
+        ]
+        if bucket_requests:
+            updates.append(self.leaderboard_buckets.bulk_write(bucket_requests, ordered=False))
+        
+        user_data = self._cache_user((await asyncio.gather(*updates))[0])
+        return user_data.get('total_score', 0)
+    
+    @metrics.timed('mongo')
+    async def record_answer_events(self, events):
+        """Apply a batch of journaled answers once; returns the users' new all-time scores"""
+        applied = set()
+        async for document in self.answer_events.find({'_id': {'$in': [event['id'] for event in events]}}, {'_id': 1}):
+            applied.add(document['_id'])
+        events_to_apply = [event for event in events if event['id'] not in applied]
+        
+        # Each write only matches a document that hasn't seen the event yet, so
+        # retrying a batch after a partial failure can't count an answer twice
+        user_requests = []
+        leaderboard_requests = []
+        bucket_requests = []
+        bucket_ids = set()
+        for event in events_to_apply:
+            user_id = event['user_id']
+            results = answer_results(event['subject'], event['correct'], event['score'])
+            query = {'applied_events': {'$ne': event['id']}}
+            pushed = {'$push': {'applied_events': {'$each': [event['id']], '$slice': -config.ANSWER_JOURNAL['batch_size']}}}
+            
+            user_requests.append(UpdateOne(
+                dict({'_id': user_id}, **query),
+                dict({'$inc': result_increments(results, event['release'])}, **pushed),
+                upsert=True
+            ))
+            leaderboard_requests.append(UpdateOne(
+                dict({'_id': user_id}, **query),
+                dict({'$inc': {'score': event['score']}}, **pushed),
+                upsert=True
+            ))
+            for board, expires_at, delta in board_updates(results, datetime.utcfromtimestamp(event['time'])):
+                bucket_requests.append(bucket_request(board, user_id, expires_at, delta, query, pushed))
+                bucket_ids.add(f'{board}:{user_id}')
+        
+        await asyncio.gather(
+            self._apply_once(self.users, user_requests),
+            self._apply_once(self.leaderboard, leaderboard_requests),
+            self._apply_once(self.leaderboard_buckets, bucket_requests)
+        )
+        
+        if events_to_apply:
+            ids = [event['id'] for event in events_to_apply]
+            expires_at = datetime.utcnow() + timedelta(seconds=config.ANSWER_JOURNAL['event_retention'])
+            try:
+                await self.answer_events.insert_many([{'_id': event_id, 'expires_at': expires_at} for event_id in ids], ordered=False)
+            except BulkWriteError as e:
+                # Another replay of the same journal recorded them first
+                if e.details.get('writeConcernErrors') or any(error['code'] != 11000 for error in e.details['writeErrors']):
+                    raise
+            
+            # Recorded ids are skipped before any write, so the documents only
+            # need to keep the ids of batches still in flight
+            applied_users = list({event['user_id'] for event in events_to_apply})
+            pulled = {'$pull': {'applied_events': {'$in': ids}}}
+            try:
+                await asyncio.gather(
+                    self.users.update_many({'_id': {'$in': applied_users}}, pulled),
+                    self.leaderboard.update_many({'_id': {'$in': applied_users}}, pulled),
+                    self.leaderboard_buckets.update_many({'_id': {'$in': list(bucket_ids)}}, pulled)
+                )
+            except Exception as e:
+                print(f"Error clearing applied answer events: {e}")
+        
+        user_ids = {event['user_id'] for event in events}
+        for event in events:
+            user_pending = self.pending_results.get(event['user_id'], {})
+            user_pending.pop(event['id'], None)
+            if not user_pending:
+                self.pending_results.pop(event['user_id'], None)
+        for user_id in user_ids:
+            self.user_cache.invalidate(user_id)
+        
+        scores = {}
+        async for document in self.leaderboard.find({'_id': {'$in': list(user_ids)}}, {'score': 1}):
+            pending = self.pending_results.get(document['_id'], {}).values()
+            scores[document['_id']] = document['score'] + sum(increments['total_score'] for increments in pending)
+        return scores
+    
+    async def _apply_once(self, collection, requests):
+        if not requests:
+            return
+        try:
+            await collection.bulk_write(requests, ordered=False)
+        except BulkWriteError as e:
+            # A guarded upsert that hits an existing document raises a
+            # duplicate key error; that document already has the event
+            if e.details.get('writeConcernErrors') or any(error['code'] != 11000 for error in e.details['writeErrors']):
+                raise
+    
+    def add_pending_event(self, event):
+        """Count a journaled answer in the cached profile; returns the new score, or None if not cached"""
+        results = answer_results(event['subject'], event['correct'], event['score'])
+        increments = result_increments(results, event['release'])
+        self.pending_results.setdefault(event['user_id'], {})[event['id']] = increments
+        
+        user_data = self.user_cache.get(event['user_id'])
+        if user_data is None:
+            return None
+        user_data = copy.deepcopy(user_data)
+        add_increments(user_data, increments)
+        self.user_cache.set(event['user_id'], user_data)
+        return user_data['total_score']
     
-    async def get_leaderboard(self, limit=10):
-        cursor = self.leaderboard.find().sort('score', -1).limit(limit)
+    def _cache_user(self, user_data):
+        # Mongo documents don't include answers still in the journal
+        pending = self.pending_results.get(user_data['_id'])
+        if pending:
+            user_data = copy.deepcopy(user_data)
+            for increments in pending.values():
+                add_increments(user_data, increments)
+        self.user_cache.set(user_data['_id'], user_data)
+        return user_data
+    
+    @metrics.timed('mongo')
+    async def record_timeouts(self, timeouts):
+        # One bulk write for every question that expired in the same sweep
+        requests = [
+            UpdateOne(
+                {'_id': str(user_id)},
+                {'$inc': {'questions_unanswered': 1, f'{subject}.unanswered': 1, 'reserved': -released}},
+                upsert=True
+            )
+            for user_id, subject, released in timeouts
+        ]
+        if requests:
+            await self.users.bulk_write(requests, ordered=False)
+        for user_id, _, _ in timeouts:
+            self.user_cache.invalidate(str(user_id))
+    
+    async def iter_user_stats(self, subjects, batch_size=1000):
+        """Yield every user's stat fields, reading from a secondary when there is one"""
+        projection = {'total_score': 1, 'questions_answered': 1, 'questions_unanswered': 1}
+        projection.update({subject: 1 for subject in subjects})
+        users = self.users.with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+        async for document in users.find({}, projection).batch_size(batch_size):
+            yield document
+    
+    async def backfill_subject_boards(self, subjects, scoring, batch_size=1000):
+        """Set all-time subject board scores from users' per-subject totals; safe to re-run"""
+        written = 0
+        requests = []
+        async for document in self.iter_user_stats(subjects, batch_size):
+            for subject in subjects:
+                subject_stats = document.get(subject) or {}
+                correct = subject_stats.get('correct', 0)
+                incorrect = subject_stats.get('total', 0) - correct
+                score = correct * scoring['correct'] + incorrect * scoring['incorrect']
+                if not score:
+                    continue
+                requests.append(UpdateOne(
+                    {'_id': f"{subject}:{document['_id']}"},
+                    {'$set': {'score': score}, '$setOnInsert': {'board': subject, 'user_id': document['_id'], 'expires_at': None}},
+                    upsert=True
+                ))
+            if len(requests) >= batch_size:
+                await self.leaderboard_buckets.bulk_write(requests, ordered=False)
+                written += len(requests)
+                requests = []
+        if requests:
+            await self.leaderboard_buckets.bulk_write(requests, ordered=False)
+            written += len(requests)
+        return written
+    
+    @metrics.timed('mongo')
+    async def save_deck(self, user_id, key, deck):
+        user_data = await self.users.find_one_and_update(
+            {'_id': str(user_id)},
+            {'$set': {f'decks.{key}': deck}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        self._cache_user(user_data)
+    
+    @metrics.timed('mongo')
+    async def get_leaderboard(self, limit=10, skip=0):
+        cursor = self.leaderboard.find().sort([('score', -1), ('_id', 1)]).skip(skip).limit(limit)
         leaderboard_data = []
         async for document in cursor:
             leaderboard_data.append((document['_id'], document.get('score', 0)))
         return leaderboard_data
+    
+    @metrics.timed('mongo')
+    async def get_board(self, board, limit=10, skip=0):
+        cursor = self.leaderboard_buckets.find({'board': board}).sort([('score', -1), ('user_id', 1)]).skip(skip).limit(limit)
+        return [(document['user_id'], document.get('score', 0)) async for document in cursor]
+    
+    @metrics.timed('mongo')
+    async def count_board(self, board):
+        return await self.leaderboard_buckets.count_documents({'board': board})
+    
+    @metrics.timed('mongo')
+    async def get_leaderboard_score(self, user_id):
+        document = await self.leaderboard.find_one({'_id': str(user_id)})
+        return document.get('score', 0) if document else None
+    
+    @metrics.timed('mongo')
+    async def count_leaderboard_above(self, score):
+        return await self.leaderboard.count_documents({'score': {'$gt': score}})
+    
+    @metrics.timed('mongo')
+    async def count_leaderboard(self):
+        return await self.leaderboard.estimated_document_count()
+    
+    @metrics.timed('mongo')
+    async def get_image_urls(self):
+        image_urls = {}
+        async for document in self.image_urls.find():
+            image_urls[document.pop('_id')] = document
+        return image_urls
+    
+    @metrics.timed('mongo')
+    async def save_image_url(self, image_hash, entry):
+        await self.image_urls.update_one(
+            {'_id': image_hash},
+            {'$set': entry},
+            upsert=True
+        )
+    
+    @metrics.timed('mongo')
+    async def publish_topic_reload(self, topic_name):
+        document = await self.topic_versions.find_one_and_update(
+            {'_id': topic_name},
+            {'$inc': {'version': 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return document['version']
+    
+    @metrics.timed('mongo')
+    async def get_topic_versions(self):
+        topic_versions = {}
+        async for document in self.topic_versions.find():
+            topic_versions[document['_id']] = document.get('version', 0)
+        return topic_versions
+    
+    @metrics.timed('mongo')
+    async def get_meta(self, key):
+        document = await self.meta.find_one({'_id': key})
+        return document.get('value') if document else None
+    
+    @metrics.timed('mongo')
+    async def increment_meta(self, key, counts):
+        await self.meta.update_one(
+            {'_id': key},
+            {'$inc': {f'value.{name}': count for name, count in counts.items()}},
+            upsert=True
+        )
+    
+    @metrics.timed('mongo')
+    async def set_meta(self, key, value):
+        await self.meta.update_one(
+            {'_id': key},
+            {'$set': {'value': value}},
+            upsert=True
+        )
@@ -0,0 +1,131 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlparse, parse_qs
+
+import discord
+
+from utils.image_optimizer import served_image
+
+class ImageCache:
+    """Uploads each question image once to a cache channel and reuses its CDN URL"""
+
+    def __init__(self, bot, database, channel_id, refresh_margin=3600):
+        self.bot = bot
+        self.db = database
+        self.channel_id = channel_id
+        self.refresh_margin = refresh_margin
+        self.entries = {}
+        self._pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.uploads = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.bytes_saved = 0
+    
+    @property
+    def enabled(self):
+        return bool(self.channel_id)
+    
+    async def load(self):
+        if self.enabled:
+            self.entries = await self.db.get_image_urls()
+            print(f"Image cache: {len(self.entries)} uploaded images")
+    
+    def _is_fresh(self, url):
+        expires = parse_qs(urlparse(url).query).get('ex')
+        if not expires:
+            return True
+        try:
+            return int(expires[0], 16) > time.time() + self.refresh_margin
+        except ValueError:
+            return False
+    
+    def get_url(self, question):
+        """Return a CDN URL for the question's image, or None to attach it (a miss uploads in the background)"""
+        image_hash = question.get('image_hash')
+        if not self.enabled or not image_hash:
+            return None
+        
+        entry = self.entries.get(image_hash)
+        if entry and self._is_fresh(entry['url']):
+            self.hits += 1
+            self.bytes_saved += entry.get('size', 0)
+            return entry['url']
+        
+        # One upload per image, however many requests miss while it runs
+        self.misses += 1
+        if image_hash not in self._pending:
+            self._pending[image_hash] = asyncio.create_task(self._store(question, entry))
+        return None
+    
+    def prefetch(self, questions):
+        """Start uploads for any of these questions' images that aren't cached yet"""
+        if not self.enabled:
+            return
+        for question in questions:
+            image_hash = question.get('image_hash')
+            if not image_hash or image_hash in self._pending:
+                continue
+            entry = self.entries.get(image_hash)
+            if entry is None or not self._is_fresh(entry['url']):
+                self._pending[image_hash] = asyncio.create_task(self._store(question, entry))
+    
+    async def _channel(self):
+        channel = self.bot.get_channel(self.channel_id)
+        if channel is None:
+            channel = await self.bot.fetch_channel(self.channel_id)
+        return channel
+    
+    async def _store(self, question, entry):
+        try:
+            await self._upload(question, entry)
+        except Exception as e:
+            self.failures += 1
+            print(f"ERROR caching image {question['image_path']}: {e}")
+        finally:
+            self._pending.pop(question['image_hash'], None)
+    
+    async def _upload(self, question, entry):
+        channel = await self._channel()
+        
+        message = None
+        if entry:
+            try:
+                message = await channel.fetch_message(entry['message_id'])
+                self.refreshes += 1
+            except discord.HTTPException:
+                message = None
+        
+        if message is None or not message.attachments:
+            self.uploads += 1
+            image_path, _ = served_image(question)
+            extension = os.path.splitext(image_path)[1] or '.png'
+            file = discord.File(image_path, filename=f"{question['image_hash']}{extension}")
+            message = await channel.send(file=file)
+        
+        entry = {
+            'url': message.attachments[0].url,
+            'message_id': message.id,
+            'size': served_image(question)[1]
+        }
+        self.entries[question['image_hash']] = entry
+        await self.db.save_image_url(question['image_hash'], entry)
+        
+        stats = self.stats()
+        print(f"Cached image {question['image_hash'][:12]} "
+              f"(hit rate {stats['hit_rate']:.0%}, {stats['bytes_saved'] // 1024} KB saved)")
+    
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'images': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'uploads': self.uploads,
+            'refreshes': self.refreshes,
+            'failures': self.failures,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'bytes_saved': self.bytes_saved
+        }
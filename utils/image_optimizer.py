@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import config
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# Recompressed copies of question images, named by content hash and settings
+CACHE_DIRNAME = '.optimized'
+
+def cache_dir(base_dir):
+    return os.path.join(base_dir, 'images', CACHE_DIRNAME)
+
+def _settings_key(settings):
+    payload = json.dumps([settings['format'], settings['max_dimension'], settings['quality']])
+    return hashlib.sha1(payload.encode()).hexdigest()[:8]
+
+def variant_path(base_dir, image_hash, settings):
+    extension = 'webp' if settings['format'] == 'webp' else 'png'
+    return os.path.join(cache_dir(base_dir), f"{image_hash}-{_settings_key(settings)}.{extension}")
+
+def _optimize(task):
+    """Write one variant; runs in a worker process"""
+    source, dest, settings = task
+    # Cluster workers may optimize the same image at once
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    try:
+        with Image.open(source) as image:
+            image.thumbnail((settings['max_dimension'], settings['max_dimension']))
+            if settings['format'] == 'webp':
+                if image.mode not in ('RGB', 'RGBA', 'L'):
+                    image = image.convert('RGBA')
+                image.save(tmp_path, 'WEBP', quality=settings['quality'], method=6)
+            else:
+                image = image.convert('RGBA').quantize(256, method=Image.Quantize.FASTOCTREE)
+                image.save(tmp_path, 'PNG', optimize=True)
+        
+        # Already well-compressed sources are kept as they are; the copy still
+        # lands in the cache so the source isn't reprocessed on every start
+        if os.path.getsize(tmp_path) >= os.path.getsize(source):
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, dest)
+        return dest
+    except Exception as e:
+        print(f"ERROR optimizing image {source}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+def _variant_sources(questions):
+    variants = {}
+    for question in questions:
+        if question.get('image_path') and question.get('image_hash'):
+            variants.setdefault(question['image_hash'], question['image_path'])
+    return variants
+
+def _missing_variants(questions, base_dir, settings):
+    tasks = []
+    for image_hash, source in _variant_sources(questions).items():
+        dest = variant_path(base_dir, image_hash, settings)
+        if not os.path.exists(dest):
+            tasks.append((source, dest, settings))
+    if tasks:
+        os.makedirs(cache_dir(base_dir), exist_ok=True)
+    return tasks
+
+def optimize_questions(questions, base_dir, settings=None):
+    """Generate missing variants in parallel and attach them; call from the main thread at startup"""
+    settings = settings or config.IMAGE_OPTIMIZATION
+    if not settings['enabled']:
+        return 0
+    if Image is None:
+        print("Pillow is not installed, serving original question images")
+        return 0
+    
+    tasks = _missing_variants(questions, base_dir, settings)
+    if tasks:
+        print(f"Optimizing {len(tasks)} question images...")
+        if len(tasks) == 1:
+            _optimize(tasks[0])
+        else:
+            with ProcessPoolExecutor(max_workers=settings['workers']) as pool:
+                list(pool.map(_optimize, tasks, chunksize=4))
+    
+    attach_variants(questions, base_dir, settings)
+    return len(tasks)
+
+def create_pool(settings=None):
+    """Process pool for generate_variants, or None if images aren't optimized"""
+    settings = settings or config.IMAGE_OPTIMIZATION
+    if not settings['enabled'] or Image is None:
+        return None
+    pool = ProcessPoolExecutor(max_workers=settings['workers'])
+    # Start the workers now, before any loader threads, rather than on first use
+    pool.submit(os.getpid).result()
+    return pool
+
+async def generate_variants(questions, base_dir, pool, settings=None):
+    """Generate missing variants in `pool` without blocking the event loop, then attach them"""
+    settings = settings or config.IMAGE_OPTIMIZATION
+    tasks = _missing_variants(questions, base_dir, settings)
+    if tasks:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(pool, _optimize, task) for task in tasks))
+    attach_variants(questions, base_dir, settings)
+    return len(tasks)
+
+def optimize_bank(base_dir, manifest):
+    """Generate variants for every question in a compiled manifest; returns (generated, questions)"""
+    questions = [question for entry in manifest['topics'].values() for question in entry['questions']]
+    for question in questions:
+        if 'image_path' in question:
+            question['image_path'] = os.path.join(base_dir, question['image_path'])
+    return optimize_questions(questions, base_dir), questions
+
+def attach_variants(questions, base_dir, settings=None):
+    """Attach optimized_path/optimized_size for variants that already exist; safe from any thread"""
+    settings = settings or config.IMAGE_OPTIMIZATION
+    if not settings['enabled']:
+        return
+    for question in questions:
+        if not (question.get('image_path') and question.get('image_hash')):
+            continue
+        dest = variant_path(base_dir, question['image_hash'], settings)
+        if os.path.exists(dest):
+            question['optimized_path'] = dest
+            question['optimized_size'] = os.path.getsize(dest)
+
+def served_image(question):
+    """Path and size of the file to send for a question's image"""
+    if question.get('optimized_path'):
+        return question['optimized_path'], question['optimized_size']
+    return question['image_path'], question.get('image_size', 0)
+
+if __name__ == "__main__":
+    from utils import question_manifest
+    
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    generated, questions = optimize_bank(base_dir, question_manifest.build_manifest(base_dir))
+    originals = {q['image_hash']: q.get('image_size', 0) for q in questions if q.get('image_hash')}
+    optimized = {q['image_hash']: q['optimized_size'] for q in questions if q.get('optimized_path')}
+    print(f"Generated {generated} variants; {sum(originals.values()) // 1024} KB of originals, "
+          f"{sum(optimized.values()) // 1024} KB optimized ({len(optimized)}/{len(originals)} images)")
@@ -1,37 +1,202 @@
-import os
-from pymongo import MongoClient
+import asyncio
+import math
+from datetime import datetime, timedelta
+
+from utils.cache import TTLCache
+
+# Subject and period boards ("math", "week:2026-W42", "day:2026-10-17:math")
+# are bucket documents, one per user and board
+PERIODS = {'day': timedelta(days=1), 'week': timedelta(weeks=1)}
+
+def period_start(period, now):
+    start = datetime(now.year, now.month, now.day)
+    if period == 'week':
+        start -= timedelta(days=start.weekday())
+    return start
+
+def board_key(subject=None, period='all', now=None):
+    parts = []
+    if period != 'all':
+        now = now or datetime.utcnow()
+        if period == 'day':
+            parts.append(f"day:{now:%Y-%m-%d}")
+        else:
+            year, week, _ = now.isocalendar()
+            parts.append(f"week:{year}-W{week:02d}")
+    if subject:
+        parts.append(subject)
+    return ':'.join(parts)
+
+def board_updates(results, now):
+    """Return (board, expires_at, score_delta) for every bucket an answer touches"""
+    subject_deltas = {subject: subject_results['score'] for subject, subject_results in results.items()}
+    
+    updates = []
+    for period in ['all', *PERIODS]:
+        expires_at = None
+        if period != 'all':
+            expires_at = period_start(period, now) + 2 * PERIODS[period]
+            # The overall period board; the all-time one is the leaderboard collection
+            updates.append((board_key(None, period, now), expires_at, sum(subject_deltas.values())))
+        for subject, delta in subject_deltas.items():
+            updates.append((board_key(subject, period, now), expires_at, delta))
+    return [update for update in updates if update[2]]
 
 class Leaderboard:
-    def __init__(self):
-        self.connection_string = os.getenv('MONGODB_URI')
-        if not self.connection_string:
-            raise ValueError("MONGODB_URI environment variable is not set")
+    """Ranks and leaderboard pages from indexed Mongo counts, cached for a few seconds"""
+
+    def __init__(self, database, top, page_size=10, ttl=30):
+        self.db = database
+        self.top = top
+        self.page_size = page_size
+        self.cache = TTLCache(max_size=1024, ttl=ttl)
+        self._counting = {}
+    
+    async def get_rank(self, user_id):
+        """Return (rank, score) for a user, or None if they have no score yet"""
+        key = f"rank:{user_id}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        
+        score = await self.db.get_leaderboard_score(user_id)
+        if score is None:
+            return None
+        
+        result = (await self.db.count_leaderboard_above(score) + 1, score)
+        self.cache.set(key, result)
+        return result
+    
+    async def page_count(self, board=None):
+        key = f"count:{board}"
+        count = self.cache.get(key)
+        if count is None:
+            # Every page needs the count, so concurrent misses share one query
+            counting = self._counting.get(board)
+            if counting is None:
+                if board is None:
+                    counting = asyncio.ensure_future(self.db.count_leaderboard())
+                else:
+                    counting = asyncio.ensure_future(self.db.count_board(board))
+                self._counting[board] = counting
+            try:
+                count = await counting
+            finally:
+                if self._counting.get(board) is counting:
+                    del self._counting[board]
+            self.cache.set(key, count)
+        return max(1, math.ceil(count / self.page_size))
+    
+    async def get_page(self, page, subject=None, period='all'):
+        """Return (page, page_count, [(rank, user_id, score)]), clamping page to the valid range"""
+        board = board_key(subject, period) if subject or period != 'all' else None
+        page_count = await self.page_count(board)
+        page = min(max(page, 1), page_count)
+        
+        if board is None and page == 1:
+            entries = await self.top.top()
+        else:
+            key = f"page:{board}:{page}"
+            entries = self.cache.get(key)
+            if entries is None:
+                skip = (page - 1) * self.page_size
+                if board is None:
+                    entries = await self.db.get_leaderboard(self.page_size, skip=skip)
+                else:
+                    entries = await self.db.get_board(board, self.page_size, skip=skip)
+                self.cache.set(key, entries)
         
-        self.client = MongoClient(self.connection_string)
-        self.db = self.client.sprint_bot
-        self.users = self.db.users
-    
-    def update_score(self, user_id, score):
-        try:
-            self.users.update_one(
-                {'_id': str(user_id)},
-                {'$set': {'total_score': score}},
-                upsert=True
+        first = (page - 1) * self.page_size + 1
+        return page, page_count, [(rank, user_id, score) for rank, (user_id, score) in enumerate(entries, first)]
+    
+    def forget(self, user_id):
+        # A user's own rank should reflect the answer they just gave
+        self.cache.invalidate(f"rank:{user_id}")
+
+class LeaderboardCache:
+    """Top of the leaderboard kept in memory; no untracked user scores above `floor`"""
+
+    def __init__(self, database, size=10, buffer=40):
+        self.db = database
+        self.size = size
+        self.capacity = size + buffer
+        self.scores = {}
+        # Bounded: pages beyond the top also resolve names through here
+        self.names = TTLCache(max_size=1024, ttl=3600)
+        self.floor = float('-inf')
+        self.loaded = False
+        self._load_lock = asyncio.Lock()
+    
+    async def load(self, only_if_stale=False):
+        async with self._load_lock:
+            # Concurrent callers that queued behind a load don't need another one
+            if only_if_stale and not self._stale():
+                return
+            entries = await self.db.get_leaderboard(self.capacity)
+            self.scores = {str(user_id): score for user_id, score in entries}
+            if len(entries) == self.capacity:
+                self.floor = entries[-1][1]
+            else:
+                self.floor = float('-inf')
+            self.loaded = True
+    
+    async def refresh(self, interval):
+        # Other processes update scores too when the bot runs as a cluster
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"Error refreshing leaderboard: {e}")
+    
+    def update(self, user_id, score, name=None):
+        user_id = str(user_id)
+        if user_id not in self.scores and score <= self.floor:
+            return
+        
+        self.scores[user_id] = score
+        if name:
+            self.names.set(user_id, name)
+        if len(self.scores) > self.capacity:
+            evicted = max(self.scores, key=lambda user_id: (-self.scores[user_id], user_id))
+            self.floor = max(self.floor, self.scores.pop(evicted))
+    
+    def _ranked(self):
+        # Same order as the Mongo pages, (score desc, _id asc), so ties at the
+        # page boundary land on exactly one page
+        ranked = sorted(self.scores.items(), key=lambda entry: (-entry[1], entry[0]))
+        return [entry for entry in ranked if entry[1] >= self.floor][:self.size]
+    
+    def _stale(self):
+        # Tracked users fell below the floor, so someone untracked may now
+        # belong in the top
+        if not self.loaded:
+            return True
+        return len(self._ranked()) < self.size and self.floor != float('-inf')
+    
+    async def top(self):
+        if self._stale():
+            await self.load(only_if_stale=True)
+        return self._ranked()
+    
+    async def resolve_names(self, bot, user_ids):
+        missing = []
+        for user_id in user_ids:
+            if user_id in self.names:
+                continue
+            user = bot.get_user(int(user_id))
+            if user:
+                self.names.set(user_id, user.name)
+            else:
+                missing.append(user_id)
+        
+        if missing:
+            users = await asyncio.gather(
+                *(bot.fetch_user(int(user_id)) for user_id in missing),
+                return_exceptions=True
             )
-        except Exception as e:
-            print(f"Error updating leaderboard score: {e}")
-    
-    def get_leaderboard(self):
-        try:
-            # Get top 10 users by score
-            top_users = self.users.find().sort('total_score', -1).limit(10)
-            
-            leaderboard_data = []
-            for user in top_users:
-                if 'total_score' in user:
-                    leaderboard_data.append((user['_id'], user['total_score']))
-            
-            return leaderboard_data
-        except Exception as e:
-            print(f"Error getting leaderboard: {e}")
-            return []
+            for user_id, user in zip(missing, users):
+                if not isinstance(user, Exception):
+                    self.names.set(user_id, user.name)
+        
+        return {user_id: self.names.get(user_id, f"User {user_id}") for user_id in user_ids}
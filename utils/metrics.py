@@ -0,0 +1,232 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from collections import defaultdict
+
+import aiohttp
+from pymongo import monitoring
+
+# Mongo round trips and Discord REST calls are attributed to the running command
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 12, 20, 50)
+
+_scope = contextvars.ContextVar('metrics_scope', default=None)
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in key) + '}'
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+    
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+    
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the given quantile"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+class _CommandListener(monitoring.CommandListener):
+    def __init__(self, registry):
+        self.registry = registry
+    
+    def started(self, event):
+        self.registry.count_round_trip(event.command_name)
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        self.registry.inc('mongo_errors_total', command=event.command_name)
+
+class Metrics:
+    def __init__(self):
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self.gauges = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, name, value=1, **labels):
+        # Also called from motor's executor threads by the command listener
+        with self._lock:
+            self.counters[(name, _key(labels))] += value
+    
+    def observe(self, name, value, buckets=SECONDS_BUCKETS, **labels):
+        key = (name, _key(labels))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+    
+    def gauge(self, name, callback):
+        self.gauges[name] = callback
+    
+    def count_round_trip(self, command_name):
+        self.inc('mongo_round_trips_total', command=command_name)
+        scope = _scope.get()
+        if scope is not None:
+            scope['mongo'] += 1
+    
+    def count_discord_call(self, method):
+        self.inc('discord_api_calls_total', method=method)
+        scope = _scope.get()
+        if scope is not None:
+            scope['discord'] += 1
+    
+    def mongo_listener(self):
+        return _CommandListener(self)
+    
+    def http_trace(self):
+        trace = aiohttp.TraceConfig()
+        
+        async def on_request_start(session, context, params):
+            self.count_discord_call(params.method)
+        
+        async def on_request_end(session, context, params):
+            if params.response.status == 429:
+                self.inc('discord_rate_limited_total', method=params.method)
+        
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        return trace
+    
+    def track(self, name):
+        """Time a command or interaction handler and count the calls it makes"""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                scope = {'mongo': 0, 'discord': 0}
+                token = _scope.set(scope)
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    self.inc('command_errors_total', command=name)
+                    raise
+                finally:
+                    _scope.reset(token)
+                    self.observe('command_seconds', time.perf_counter() - start, command=name)
+                    self.observe('command_mongo_round_trips', scope['mongo'], COUNT_BUCKETS, command=name)
+                    self.observe('command_discord_calls', scope['discord'], COUNT_BUCKETS, command=name)
+            return wrapper
+        return decorator
+    
+    def timed(self, name):
+        """Time a function, labelled with its name; works for sync and async functions"""
+        def decorator(func):
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return await func(*args, **kwargs)
+                    finally:
+                        self.observe(f'{name}_seconds', time.perf_counter() - start, method=func.__name__)
+            else:
+                @functools.wraps(func)
+                def wrapper(*args, **kwargs):
+                    start = time.perf_counter()
+                    try:
+                        return func(*args, **kwargs)
+                    finally:
+                        self.observe(f'{name}_seconds', time.perf_counter() - start, method=func.__name__)
+            return wrapper
+        return decorator
+    
+    def command_summary(self):
+        summary = {}
+        for (name, key), histogram in self.histograms.items():
+            if name != 'command_seconds':
+                continue
+            command = dict(key)['command']
+            round_trips = self.histograms.get(('command_mongo_round_trips', key))
+            discord_calls = self.histograms.get(('command_discord_calls', key))
+            summary[command] = {
+                'calls': histogram.count,
+                'p50': histogram.quantile(0.5),
+                'p95': histogram.quantile(0.95),
+                'p99': histogram.quantile(0.99),
+                'mongo_per_call': round_trips.sum / round_trips.count if round_trips and round_trips.count else 0.0,
+                'discord_per_call': discord_calls.sum / discord_calls.count if discord_calls and discord_calls.count else 0.0
+            }
+        return summary
+    
+    def gauge_values(self):
+        values = {}
+        for name, callback in self.gauges.items():
+            try:
+                values[name] = callback()
+            except Exception:
+                continue
+        return values
+    
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            counters = list(self.counters.items())
+        for (name, key), value in sorted(counters):
+            lines.append(f'sprint_{name}{_format_labels(key)} {value}')
+        
+        for (name, key), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                labels = _format_labels(key + (('le', bound),))
+                lines.append(f'sprint_{name}_bucket{labels} {cumulative}')
+            lines.append(f'sprint_{name}_sum{_format_labels(key)} {histogram.sum}')
+            lines.append(f'sprint_{name}_count{_format_labels(key)} {histogram.count}')
+        
+        for name, value in sorted(self.gauge_values().items()):
+            lines.append(f'sprint_{name} {value}')
+        return '\n'.join(lines) + '\n'
+    
+    async def serve(self, host, port):
+        """Serve the Prometheus text format on every request to host:port"""
+        async def handle(reader, writer):
+            try:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                body = self.render_prometheus().encode()
+                writer.write(
+                    b'HTTP/1.1 200 OK\r\n'
+                    b'Content-Type: text/plain; version=0.0.4\r\n'
+                    + f'Content-Length: {len(body)}\r\n'.encode()
+                    + b'Connection: close\r\n\r\n'
+                    + body
+                )
+                await writer.drain()
+            finally:
+                writer.close()
+        
+        server = await asyncio.start_server(handle, host, port)
+        print(f"Serving metrics on http://{host}:{port}/metrics")
+        return server
+
+# Shared by the bot and its components
+metrics = Metrics()
@@ -1,202 +1,242 @@
+import asyncio
 import os
 import random
-import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import config
+from utils import image_optimizer, question_manifest
+from utils.metrics import metrics
 
 class QuestionManager:
-    def __init__(self):
+    """Question bank, loaded up front or, in lazy mode, one topic at a time on first use"""
+
+    def __init__(self, verbose=True, lazy=False):
         self.questions = {
             'math': {},
             'english': {},
             'analytical': {}
         }
+        self.topic_keys = {}
+        self.lazy = lazy
+        self.request_counts = Counter()
+        self._topic_locks = {
+            (subject, topic): threading.Lock()
+            for subject, topics in config.SUBJECT_TOPICS.items() for topic in topics
+        }
+        self._pools_lock = threading.Lock()
+        # Created here, on the main thread, for variants of topics loaded later
+        self.image_pool = image_optimizer.create_pool()
+        self._optimizing = set()
         self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        print(f"Base directory: {self.base_dir}")
-        self._load_questions()
-        self._print_question_stats()
+        if lazy:
+            self._build_pools()
+        else:
+            self._load_questions()
+        if verbose:
+            self.print_question_stats()
     
-    def _print_question_stats(self):
+    def print_question_stats(self):
+        print(f"Base directory: {self.base_dir}")
         print("\n=== QUESTION LOADING STATISTICS ===")
+        if self.lazy:
+            print(f"Lazy loading: {len(self.topic_keys)}/{len(self._topic_locks)} topics loaded")
         total_questions = 0
         for subject, topics in self.questions.items():
             print(f"\n{subject.upper()}:")
-            for topic, questions in topics.items():
+            for topic, questions in list(topics.items()):
                 print(f"  {topic}: {len(questions)} questions")
                 total_questions += len(questions)
         print(f"\nTOTAL QUESTIONS LOADED: {total_questions}")
     
     def _load_questions(self):
         print("Loading questions...")
-        
-        # Load math questions
-        for topic in config.MATH_TOPICS:
-            topic_path = os.path.join(self.base_dir, 'images', 'math', topic)
-            self.questions['math'][topic] = self._load_topic_questions(topic_path, 'math', topic)
-            question_count = len(self.questions['math'][topic])
-            if question_count > 0:
-                print(f"Math/{topic}: {question_count} questions")
-            else:
-                print(f"Math/{topic}: No questions found")
-        
-        # Load english questions
-        for topic in config.ENGLISH_TOPICS:
-            topic_path = os.path.join(self.base_dir, 'images', 'english', topic)
-            self.questions['english'][topic] = self._load_topic_questions(topic_path, 'english', topic)
-            question_count = len(self.questions['english'][topic])
-            if question_count > 0:
-                print(f"English/{topic}: {question_count} questions")
-            else:
-                print(f"English/{topic}: No questions found")
-        
-        # Load analytical questions
-        for topic in config.ANALYTICAL_TOPICS:
-            topic_path = os.path.join(self.base_dir, 'images', 'analytical', topic)
-            self.questions['analytical'][topic] = self._load_topic_questions(topic_path, 'analytical', topic)
-            question_count = len(self.questions['analytical'][topic])
-            if question_count > 0:
-                print(f"Analytical/{topic}: {question_count} questions")
-            else:
-                print(f"Analytical/{topic}: No questions found")
-    
-    def _load_topic_questions(self, topic_path, subject, topic_name):
-        questions = []
-        
-        # Check if questions.json exists for this topic
-        json_path = os.path.join(topic_path, 'questions.json')
-        if os.path.exists(json_path):
-            try:
-                with open(json_path, 'r', encoding='utf-8') as f:
-                    file_content = f.read().strip()
-                    
-                    # Check if file is empty
-                    if not file_content:
-                        print(f"WARNING: Empty questions.json at {json_path}")
-                        return questions
-                    
-                    # Try to parse JSON
-                    questions = json.loads(file_content)
-                    
-                    # FIX IMAGE PATHS - This is the key fix!
-                    for question in questions:
-                        if 'image_path' in question:
-                            image_rel_path = question['image_path']
-                            
-                            # If path is relative, make it absolute relative to the topic folder
-                            if not os.path.isabs(image_rel_path):
-                                # Join with the topic path to get full absolute path
-                                absolute_path = os.path.join(topic_path, image_rel_path)
-                                question['image_path'] = absolute_path
-                            
-                            # Verify the image actually exists
-                            if not os.path.exists(question['image_path']):
-                                print(f"❌ Image not found: {question['image_path']}")
-                                # Remove invalid path to prevent errors
-                                question.pop('image_path', None)
-                            else:
-                                print(f"✅ Image found: {question['image_path']}")
-                    
-                    print(f"✓ Loaded {len(questions)} questions from {json_path}")
-                    
-            except json.JSONDecodeError as e:
-                print(f"ERROR: Invalid JSON in {json_path}")
-                print(f"JSON Error: {e}")
-            except Exception as e:
-                print(f"ERROR loading questions from {json_path}: {e}")
-        else:
-            print(f"WARNING: questions.json not found at {json_path}")
-        
-        # Also load image files if no questions were loaded from JSON
-        if not questions:
-            questions = self._load_images_as_questions(topic_path)
-        
+        manifest = question_manifest.build_manifest(self.base_dir)
+        
+        for subject, topics in config.SUBJECT_TOPICS.items():
+            for topic in topics:
+                entry = manifest['topics'][f"{subject}/{topic}"]
+                self.questions[subject][topic] = self._resolve_image_paths(entry['questions'])
+                self.topic_keys[f"{subject}/{topic}"] = entry['key']
+        
+        image_optimizer.optimize_questions(
+            [question for topics in self.questions.values() for questions in topics.values() for question in questions],
+            self.base_dir
+        )
+        self._build_pools()
+    
+    def _resolve_image_paths(self, questions):
+        # The manifest stores image paths relative to the bank root
+        for question in questions:
+            if 'image_path' in question:
+                question['image_path'] = os.path.join(self.base_dir, question['image_path'])
         return questions
     
-    def _load_images_as_questions(self, topic_path):
-        questions = []
-        image_extensions = ['.png', '.jpg', '.jpeg', '.gif', '.webp']
-        
-        if os.path.exists(topic_path):
-            try:
-                image_files = []
-                for file in os.listdir(topic_path):
-                    if any(file.lower().endswith(ext) for ext in image_extensions):
-                        image_files.append(file)
-                
-                for image_file in image_files:
-                    # Create a question entry for the image
-                    image_path = os.path.join(topic_path, image_file)
-                    questions.append({
-                        'question': f"Refer to the image for this problem",
-                        'options': ['A', 'B', 'C', 'D', 'E'],
-                        'correct_answer': 0,
-                        'image_path': image_path
-                    })
-                
-                if questions:
-                    print(f"✓ Created {len(questions)} questions from images in {topic_path}")
-                    
-            except Exception as e:
-                print(f"ERROR loading images from {topic_path}: {e}")
+    def _load_topic(self, subject, topic, force=False):
+        # Runs in worker threads, so it only attaches variants that exist;
+        # optimize_images generates the rest from the event loop
+        entry = question_manifest.load_topic(self.base_dir, subject, topic, force)
+        questions = self._resolve_image_paths(entry['questions'])
+        image_optimizer.attach_variants(questions, self.base_dir)
+        return entry['key'], questions
+    
+    def _ensure_loaded(self, subject, topic):
+        lock = self._topic_locks.get((subject, topic))
+        if lock is None or topic in self.questions[subject]:
+            return
+        
+        with lock:
+            # Whoever held the lock may have loaded it already
+            if topic in self.questions[subject]:
+                return
+            key, questions = self._load_topic(subject, topic)
+            self.topic_keys[f"{subject}/{topic}"] = key
+            self.questions[subject][topic] = questions
+            self._build_pools()
+            return True
+    
+    def needs_loading(self, subject, topic):
+        return (subject, topic) in self._topic_locks and topic not in self.questions[subject]
+    
+    def unloaded_topics(self):
+        return [(subject, topic) for subject, topic in self._topic_locks if self.needs_loading(subject, topic)]
+    
+    async def load_topic(self, subject, topic):
+        """Make sure a topic is loaded, loading it off the event loop if it isn't"""
+        if self.needs_loading(subject, topic) and await asyncio.to_thread(self._ensure_loaded, subject, topic):
+            # Originals are served until the variants are ready
+            task = asyncio.ensure_future(self.optimize_images(self.questions[subject][topic]))
+            self._optimizing.add(task)
+            task.add_done_callback(self._optimizing.discard)
+    
+    async def optimize_images(self, questions):
+        if self.image_pool is None:
+            return
+        try:
+            generated = await image_optimizer.generate_variants(questions, self.base_dir, self.image_pool)
+            if generated:
+                print(f"Optimized {generated} question images")
+        except Exception as e:
+            print(f"Error optimizing question images: {e}")
+    
+    async def load_all(self):
+        await asyncio.gather(*(self.load_topic(subject, topic) for subject, topic in self.unloaded_topics()))
+    
+    async def warm_up(self, popularity=None, workers=4):
+        """Load every topic not loaded yet in a thread pool, most requested first"""
+        popularity = popularity or {}
+        pending = self.unloaded_topics()
+        pending.sort(key=lambda name: popularity.get(f"{name[0]}:{name[1]}", 0), reverse=True)
+        if not pending:
+            return
+        
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # The pool starts tasks in submission order
+            await asyncio.gather(*(
+                loop.run_in_executor(pool, self._ensure_loaded, subject, topic)
+                for subject, topic in pending
+            ))
+        print(f"Warmed up {len(pending)} question topics")
+        await self.optimize_images([
+            question for subject, topic in pending for question in self.questions[subject].get(topic, [])
+        ])
+    
+    def take_request_counts(self):
+        counts, self.request_counts = self.request_counts, Counter()
+        return counts
+    
+    def changed_topics(self):
+        """Return (subject, topic) pairs whose files changed since they were loaded"""
+        changed = []
+        for subject, topics in self.questions.items():
+            for topic in list(topics):
+                topic_path = question_manifest.topic_dir(self.base_dir, subject, topic)
+                if question_manifest.topic_key(topic_path) != self.topic_keys.get(f"{subject}/{topic}"):
+                    changed.append((subject, topic))
+        return changed
+    
+    async def reload_topic(self, subject, topic):
+        """Recompile one topic off the event loop and swap it in; returns the new question count"""
+        if topic not in self.questions.get(subject, {}) and (subject, topic) not in self._topic_locks:
+            return None
         
-        return questions
+        key, questions = await asyncio.to_thread(self._load_topic, subject, topic, True)
+        
+        # Replacing the list reference is atomic for anything running on the
+        # loop, so get_question sees either the old topic or the new one.
+        self.questions[subject][topic] = questions
+        self.topic_keys[f"{subject}/{topic}"] = key
+        self._build_pools()
+        print(f"Reloaded {subject}/{topic}: {len(questions)} questions")
+        # Changed images have a new content hash, so they get new variants
+        await self.optimize_images(questions)
+        return len(questions)
     
-    def get_question(self, subject, topic):
+    def get_topic_questions(self, subject, topic):
         if subject not in self.questions:
             print(f"ERROR: Subject '{subject}' not found")
-            return None
+            return []
         
+        # Only reached unloaded from sync callers; async code awaits load_topic first
+        self._ensure_loaded(subject, topic)
         if topic not in self.questions[subject]:
             print(f"ERROR: Topic '{topic}' not found in subject '{subject}'")
-            return None
+            return []
         
+        self.request_counts[f"{subject}:{topic}"] += 1
         questions = self.questions[subject][topic]
         if not questions:
             print(f"WARNING: No questions available for {subject}/{topic}")
+        return questions
+    
+    @metrics.timed('questions')
+    def get_question(self, subject, topic):
+        questions = self.get_topic_questions(subject, topic)
+        if not questions:
             return None
         
         # Select a random question
-        selected_question = random.choice(questions)
-        
-        # Verify the image exists if specified
-        if 'image_path' in selected_question:
-            image_path = selected_question['image_path']
-            if not os.path.exists(image_path):
-                print(f"WARNING: Image file not found: {image_path}")
-                # Remove the invalid image path
-                selected_question = selected_question.copy()
-                selected_question.pop('image_path', None)
-        
-        return selected_question
+        return random.choice(questions)
+    
+    def _build_pools(self):
+        # Per-subject pools for mock tests, built once per load instead of per test.
+        # Loader threads rebuild them one at a time, each from the latest
+        # questions, and readers only ever see a finished dict.
+        with self._pools_lock:
+            pools = {}
+            for subject, topics in self.questions.items():
+                pool = [(topic, questions) for topic, questions in list(topics.items()) if questions]
+                pools[subject] = (pool, sum(len(questions) for _, questions in pool))
+            self.pools = pools
+    
+    def _sample_subject(self, subject, count):
+        pool, pool_size = self.pools.get(subject, ([], 0))
+        count = min(count, pool_size)
+        if not count:
+            return []
+        
+        # Split the count across topics in proportion to their size, giving the
+        # leftover questions to the largest remainders (ties broken randomly)
+        quotas = [count * len(questions) / pool_size for _, questions in pool]
+        allocation = [int(quota) for quota in quotas]
+        order = list(range(len(pool)))
+        random.shuffle(order)
+        order.sort(key=lambda i: quotas[i] - allocation[i], reverse=True)
+        for i in order[:count - sum(allocation)]:
+            allocation[i] += 1
+        
+        sample = []
+        for (topic, questions), topic_count in zip(pool, allocation):
+            for question in random.sample(questions, topic_count):
+                sample.append({'subject': subject, 'topic': topic, 'question': question})
+        return sample
     
     def generate_mock_test(self):
         test_questions = []
-        
-        # Add math questions
-        math_count = config.MOCK_TEST_CONFIG['math_count']
-        math_questions = []
-        for topic, questions in self.questions['math'].items():
-            math_questions.extend(questions)
-        
-        if math_questions:
-            test_questions.extend(random.sample(math_questions, min(math_count, len(math_questions))))
-        
-        # Add english questions
-        english_count = config.MOCK_TEST_CONFIG['english_count']
-        english_questions = []
-        for topic, questions in self.questions['english'].items():
-            english_questions.extend(questions)
-        
-        if english_questions:
-            test_questions.extend(random.sample(english_questions, min(english_count, len(english_questions))))
-        
-        # Add analytical questions
-        analytical_count = config.MOCK_TEST_CONFIG['analytical_count']
-        analytical_questions = []
-        for topic, questions in self.questions['analytical'].items():
-            analytical_questions.extend(questions)
-        
-        if analytical_questions:
-            test_questions.extend(random.sample(analytical_questions, min(analytical_count, len(analytical_questions))))
+        for subject in self.questions:
+            count = config.MOCK_TEST_CONFIG.get(f'{subject}_count', 0)
+            test_questions.extend(self._sample_subject(subject, count))
         
         # Shuffle questions
         random.shuffle(test_questions)
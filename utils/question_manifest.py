@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import sys
+
+import config
+
+# Compiled question bank, one file per topic, recompiled when the topic's files change
+MANIFEST_VERSION = 2
+MANIFEST_DIRNAME = '.manifest'
+IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.gif', '.webp']
+
+def manifest_path(base_dir):
+    return os.path.join(base_dir, 'images', MANIFEST_DIRNAME)
+
+def entry_path(base_dir, subject, topic):
+    return os.path.join(manifest_path(base_dir), f"{subject}.{topic}.json")
+
+def topic_dir(base_dir, subject, topic):
+    path = os.path.join(base_dir, 'images', subject, topic)
+    if os.path.isdir(path):
+        return path
+    
+    # Topic names in config don't always match the directory case (e.g. "cr" vs "CR")
+    subject_dir = os.path.join(base_dir, 'images', subject)
+    if os.path.isdir(subject_dir):
+        for name in os.listdir(subject_dir):
+            if name.lower() == topic.lower():
+                return os.path.join(subject_dir, name)
+    return path
+
+def topic_key(topic_path):
+    key = []
+    for path in (os.path.join(topic_path, 'questions.json'), topic_path):
+        try:
+            stat = os.stat(path)
+            key.extend([stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            key.extend([None, None])
+    
+    # Replacing an image in place leaves the directory mtime alone, so each
+    # image's own mtime/size is part of the key too
+    try:
+        names = sorted(os.listdir(topic_path))
+    except OSError:
+        names = []
+    for name in names:
+        if any(name.lower().endswith(ext) for ext in IMAGE_EXTENSIONS):
+            try:
+                stat = os.stat(os.path.join(topic_path, name))
+            except OSError:
+                continue
+            key.append([name, stat.st_mtime_ns, stat.st_size])
+    return key
+
+def _hash_file(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _validate_question(question):
+    if not isinstance(question, dict):
+        return "not an object"
+    if not isinstance(question.get('question'), str):
+        return "missing 'question' text"
+    
+    options = question.get('options')
+    if not isinstance(options, list) or not options:
+        return "missing 'options'"
+    if len(options) > 25:
+        return "more than 25 options"
+    
+    correct_answer = question.get('correct_answer')
+    if not isinstance(correct_answer, int) or not 0 <= correct_answer < len(options):
+        return "'correct_answer' is not a valid option index"
+    return None
+
+def _attach_image(question, image_path, base_dir):
+    if not os.path.exists(image_path):
+        print(f"❌ Image not found: {image_path}")
+        question.pop('image_path', None)
+        return
+    
+    question['image_path'] = os.path.relpath(image_path, base_dir).replace(os.sep, '/')
+    question['image_hash'] = _hash_file(image_path)
+    question['image_size'] = os.path.getsize(image_path)
+
+def compile_topic(topic_path, base_dir):
+    questions = []
+    
+    # Check if questions.json exists for this topic
+    json_path = os.path.join(topic_path, 'questions.json')
+    if os.path.exists(json_path):
+        try:
+            with open(json_path, 'r', encoding='utf-8') as f:
+                file_content = f.read().strip()
+            
+            if not file_content:
+                print(f"WARNING: Empty questions.json at {json_path}")
+            else:
+                for i, question in enumerate(json.loads(file_content)):
+                    error = _validate_question(question)
+                    if error:
+                        print(f"WARNING: Skipping question {i} in {json_path}: {error}")
+                        continue
+                    
+                    # Relative image paths are relative to the topic folder
+                    if 'image_path' in question:
+                        image_path = question['image_path']
+                        if not os.path.isabs(image_path):
+                            image_path = os.path.join(topic_path, image_path)
+                        _attach_image(question, image_path, base_dir)
+                    
+                    questions.append(question)
+        
+        except json.JSONDecodeError as e:
+            print(f"ERROR: Invalid JSON in {json_path}")
+            print(f"JSON Error: {e}")
+        except Exception as e:
+            print(f"ERROR loading questions from {json_path}: {e}")
+    
+    # Fall back to bare image files if no questions were loaded from JSON
+    if not questions and os.path.isdir(topic_path):
+        for file in sorted(os.listdir(topic_path)):
+            if any(file.lower().endswith(ext) for ext in IMAGE_EXTENSIONS):
+                question = {
+                    'question': "Refer to the image for this problem",
+                    'options': ['A', 'B', 'C', 'D', 'E'],
+                    'correct_answer': 0
+                }
+                _attach_image(question, os.path.join(topic_path, file), base_dir)
+                questions.append(question)
+    
+    return questions
+
+def load_entry(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if entry.get('version') != MANIFEST_VERSION:
+        return None
+    return entry
+
+def save_entry(entry, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Cluster workers may compile the same topic at once
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def load_topic(base_dir, subject, topic, force=False):
+    """Load one topic's entry, recompiling it if its files changed."""
+    path = entry_path(base_dir, subject, topic)
+    topic_path = topic_dir(base_dir, subject, topic)
+    # Take the key first so a change made mid-compile is picked up next time
+    key = topic_key(topic_path)
+    
+    entry = None if force else load_entry(path)
+    if entry is None or entry['key'] != key:
+        entry = {'version': MANIFEST_VERSION, 'key': key, 'questions': compile_topic(topic_path, base_dir)}
+        print(f"Compiled {subject}/{topic}: {len(entry['questions'])} questions")
+        try:
+            save_entry(entry, path)
+        except OSError as e:
+            print(f"WARNING: Could not write question manifest to {path}: {e}")
+    return entry
+
+def build_manifest(base_dir, force=False):
+    """Load every topic, recompiling any whose files changed."""
+    manifest = {'version': MANIFEST_VERSION, 'topics': {}}
+    for subject, topics in config.SUBJECT_TOPICS.items():
+        for topic in topics:
+            manifest['topics'][f"{subject}/{topic}"] = load_topic(base_dir, subject, topic, force)
+    return manifest
+
+if __name__ == "__main__":
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    manifest = build_manifest(base_dir, force='--force' in sys.argv)
+    total = sum(len(entry['questions']) for entry in manifest['topics'].values())
+    print(f"Wrote {manifest_path(base_dir)}: {len(manifest['topics'])} topics, {total} questions")
@@ -0,0 +1,64 @@
+import random
+
+from utils.metrics import metrics
+
+MASK64 = (1 << 64) - 1
+
+def _mix(value, seed, round_number):
+    # splitmix64 finalizer; stable across runs and Python versions, unlike hash()
+    z = (value + seed * 0x9E3779B97F4A7C15 + round_number * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+def shuffled_index(position, size, seed):
+    """Return the item at `position` of a seeded shuffle of range(size) (Feistel network, cycle walking)"""
+    if size <= 1:
+        return 0
+    
+    half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+    mask = (1 << half_bits) - 1
+    value = position
+    while True:
+        left, right = value >> half_bits, value & mask
+        for round_number in range(4):
+            left, right = right, left ^ (_mix(right, seed, round_number) & mask)
+        value = (left << half_bits) | right
+        if value < size:
+            return value
+
+class QuestionSampler:
+    """Deals each user a shuffled deck per topic, stored as {size, seed, position}"""
+
+    def __init__(self, database, question_manager):
+        self.db = database
+        self.qm = question_manager
+    
+    async def draw(self, user_id, subject, topic):
+        questions = await self.draw_many(user_id, subject, topic, 1)
+        return questions[0] if questions else None
+    
+    @metrics.timed('questions')
+    async def draw_many(self, user_id, subject, topic, count):
+        """Deal up to `count` distinct questions with one deck read and one write"""
+        await self.qm.load_topic(subject, topic)
+        questions = self.qm.get_topic_questions(subject, topic)
+        if not questions:
+            return []
+        
+        user_data = await self.db.get_user(user_id)
+        key = f"{subject}:{topic}"
+        deck = user_data.get('decks', {}).get(key)
+        
+        drawn = {}
+        count = min(count, len(questions))
+        while len(drawn) < count:
+            if deck is None or deck['position'] >= deck['size'] or deck['size'] > len(questions):
+                deck = {'size': len(questions), 'seed': random.getrandbits(32), 'position': 0}
+            # A reshuffle mid-draw can deal a question already taken from the old deck
+            index = shuffled_index(deck['position'], deck['size'], deck['seed'])
+            deck = dict(deck, position=deck['position'] + 1)
+            drawn.setdefault(index, questions[index])
+        
+        await self.db.save_deck(user_id, key, deck)
+        return list(drawn.values())
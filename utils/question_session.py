@@ -0,0 +1,62 @@
+import time
+
+import config
+
+class QuestionSession:
+    """Questions answered in one message under one deadline, saved with one write at the end"""
+
+    def __init__(self, user_id, items, time_limit, title, kind="mock_test"):
+        self.user_id = user_id
+        self.items = items
+        self.title = title
+        self.kind = kind
+        self.answers = [None] * len(items)
+        self.index = 0
+        self.deadline = time.monotonic() + time_limit
+        self.interaction = None
+        # Free-tier questions held for this session by AccessControl.check_access
+        self.reserved = 0
+    
+    @property
+    def current(self):
+        return self.items[self.index] if self.index < len(self.items) else None
+    
+    @property
+    def finished(self):
+        return self.index >= len(self.items) or self.remaining_time <= 0
+    
+    @property
+    def remaining_time(self):
+        return max(0, int(self.deadline - time.monotonic()))
+    
+    def answer(self, option_index):
+        """Record an answer for the current question and move on; returns whether it was correct."""
+        question = self.items[self.index]['question']
+        self.answers[self.index] = option_index
+        self.index += 1
+        return option_index == question['correct_answer']
+    
+    def results(self):
+        # Unanswered questions count towards neither the score nor the totals
+        results = {}
+        for item, option_index in zip(self.items, self.answers):
+            if option_index is None:
+                continue
+            
+            subject_results = results.setdefault(item['subject'], {'correct': 0, 'total': 0, 'score': 0})
+            subject_results['total'] += 1
+            if option_index == item['question']['correct_answer']:
+                subject_results['correct'] += 1
+                subject_results['score'] += config.SCORING['correct']
+            else:
+                subject_results['score'] += config.SCORING['incorrect']
+        return results
+    
+    def summary(self):
+        results = self.results()
+        return {
+            'questions': len(self.items),
+            'answered': sum(subject['total'] for subject in results.values()),
+            'correct': sum(subject['correct'] for subject in results.values()),
+            'score': sum(subject['score'] for subject in results.values())
+        }
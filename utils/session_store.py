@@ -0,0 +1,65 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+# Which users have a question in flight; shared through Mongo in cluster mode
+
+class MemorySessionStore:
+    def __init__(self):
+        self.sessions = {}
+    
+    async def ensure_indexes(self):
+        pass
+    
+    async def claim(self, user_id, data, ttl):
+        now = time.monotonic()
+        session = self.sessions.get(user_id)
+        if session is not None and session[0] > now:
+            return False
+        self.sessions[user_id] = (now + ttl, data)
+        return True
+    
+    async def release(self, user_id):
+        self.sessions.pop(user_id, None)
+    
+    async def release_many(self, user_ids):
+        for user_id in user_ids:
+            self.sessions.pop(user_id, None)
+    
+    def __len__(self):
+        return len(self.sessions)
+
+class MongoSessionStore:
+    def __init__(self, database):
+        self.sessions = database.db.sessions
+    
+    async def ensure_indexes(self):
+        # Mongo's TTL monitor only runs about once a minute, so claim() also
+        # treats documents past expires_at as free.
+        await self.sessions.create_index('expires_at', expireAfterSeconds=0)
+    
+    async def claim(self, user_id, data, ttl):
+        now = datetime.now(timezone.utc)
+        try:
+            await self.sessions.update_one(
+                {'_id': str(user_id), 'expires_at': {'$lte': now}},
+                {'$set': {'expires_at': now + timedelta(seconds=ttl), 'data': data}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # An unexpired session exists, so the upsert collided with it
+            return False
+        return True
+    
+    async def release(self, user_id):
+        await self.sessions.delete_one({'_id': str(user_id)})
+    
+    async def release_many(self, user_ids):
+        if user_ids:
+            await self.sessions.delete_many({'_id': {'$in': [str(user_id) for user_id in user_ids]}})
+
+def create_session_store(kind, database):
+    if kind == 'mongo':
+        return MongoSessionStore(database)
+    return MemorySessionStore()
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import csv
+import gzip
+import io
+import os
+from datetime import datetime
+
+import config
+
+# Streams per-user stats out of Mongo as CSV, one cursor batch at a time
+
+def columns(subjects):
+    header = ['user_id', 'total_score', 'questions_answered', 'questions_unanswered']
+    for subject in subjects:
+        header.extend([f'{subject}_correct', f'{subject}_total', f'{subject}_unanswered', f'{subject}_accuracy'])
+    return header
+
+def user_row(document, subjects):
+    row = [
+        document['_id'],
+        document.get('total_score', 0),
+        document.get('questions_answered', 0),
+        document.get('questions_unanswered', 0)
+    ]
+    for subject in subjects:
+        subject_stats = document.get(subject) or {}
+        correct = subject_stats.get('correct', 0)
+        total = subject_stats.get('total', 0)
+        accuracy = round(correct / total, 4) if total else ''
+        row.extend([correct, total, subject_stats.get('unanswered', 0), accuracy])
+    return row
+
+def default_path(compress=False):
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    name = f"user_stats_{datetime.utcnow():%Y%m%d_%H%M%S}.csv"
+    return os.path.join(base_dir, config.STATS_EXPORT['directory'], name + ('.gz' if compress else ''))
+
+async def export_user_stats(database, path, compress=False, batch_size=None):
+    """Write every user's stats to `path` as CSV; returns the number of users written"""
+    subjects = list(config.SUBJECT_TOPICS)
+    batch_size = batch_size or config.STATS_EXPORT['batch_size']
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    
+    if compress:
+        handle = await asyncio.to_thread(gzip.open, path, 'wt', encoding='utf-8', newline='')
+    else:
+        handle = await asyncio.to_thread(open, path, 'w', encoding='utf-8', newline='')
+    
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns(subjects))
+    count = 0
+    try:
+        async for document in database.iter_user_stats(subjects, batch_size):
+            writer.writerow(user_row(document, subjects))
+            count += 1
+            if count % batch_size == 0:
+                await asyncio.to_thread(handle.write, buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+        await asyncio.to_thread(handle.write, buffer.getvalue())
+    finally:
+        await asyncio.to_thread(handle.close)
+    return count
+
+async def main(args):
+    from utils.database import MongoDB
+    
+    path = args.output or default_path(args.gzip)
+    count = await export_user_stats(MongoDB(), path, compress=args.gzip)
+    print(f"Exported {count} users to {path} ({os.path.getsize(path) // 1024} KB)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export per-user stats from Mongo as CSV")
+    parser.add_argument("--output", help="file to write (default: a timestamped file in the export directory)")
+    parser.add_argument("--gzip", action="store_true", help="gzip the CSV")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,50 @@
+import asyncio
+
+class TopicReloader:
+    """Reloads single question topics on file changes or, in a cluster, on published versions"""
+
+    def __init__(self, question_manager, database, interval=10, clustered=False):
+        self.qm = question_manager
+        self.db = database
+        self.interval = interval
+        self.clustered = clustered
+        self.versions = None
+    
+    async def reload(self, subject, topic, publish=False):
+        count = await self.qm.reload_topic(subject, topic)
+        if count is not None and publish and self.clustered:
+            name = f"{subject}/{topic}"
+            version = await self.db.publish_topic_reload(name)
+            # Already reloaded here; don't pick up our own broadcast
+            if self.versions is not None:
+                self.versions[name] = version
+        return count
+    
+    async def _published_topics(self):
+        versions = await self.db.get_topic_versions()
+        previous, self.versions = self.versions, versions
+        if previous is None:
+            return []
+        
+        topics = []
+        for name, version in versions.items():
+            if version != previous.get(name):
+                subject, topic = name.split('/', 1)
+                topics.append((subject, topic))
+        return topics
+    
+    async def watch(self, filesystem=True):
+        while True:
+            try:
+                changed = set()
+                if filesystem:
+                    changed.update(await asyncio.to_thread(self.qm.changed_topics))
+                if self.clustered:
+                    changed.update(await self._published_topics())
+                
+                for subject, topic in changed:
+                    await self.reload(subject, topic)
+            except Exception as e:
+                print(f"Error watching question topics: {e}")
+            
+            await asyncio.sleep(self.interval)
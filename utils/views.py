@@ -0,0 +1,22 @@
+import discord
+
+from utils.metrics import metrics
+
+class TrackedView(discord.ui.View):
+    """Base for the bot's views; every item's callback runs under metrics.track(metric_name)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for item in self.children:
+            self._track(item)
+    
+    def add_item(self, item):
+        self._track(item)
+        return super().add_item(item)
+    
+    @staticmethod
+    def _track(item):
+        if getattr(item, '_tracked', False):
+            return
+        item.callback = metrics.track(getattr(item, 'metric_name', type(item).__name__))(item.callback)
+        item._tracked = True